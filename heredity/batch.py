@@ -0,0 +1,171 @@
+import argparse
+import csv
+import multiprocessing
+import os
+import random
+
+from heredity import (components, exact_inference, gibbs_sampling,
+                      likelihood_weighting, load_data, SAMPLES)
+
+COLUMNS = ["family", "person", "gene_2", "gene_1", "gene_0",
+           "trait_true", "trait_false"]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compute gene and trait marginals for many families.")
+    parser.add_argument("source",
+                        help="directory of family CSVs, or a manifest file "
+                             "listing one family CSV per line")
+    parser.add_argument("output", help="CSV file to write results to")
+    parser.add_argument("--method", default="exact",
+                        choices=["exact", "likelihood", "gibbs"])
+    parser.add_argument("--samples", type=positive_int, default=SAMPLES)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=positive_int, default=None,
+                        help="number of worker processes (default: all cores)")
+    parser.add_argument("--split", action="store_true",
+                        help="solve disconnected families within a file "
+                             "as separate tasks")
+    args = parser.parse_args()
+
+    try:
+        files = family_files(args.source)
+    except ValueError as error:
+        parser.error(str(error))
+    rows = batch(files, args.method, args.samples, args.seed,
+                 args.workers, args.split)
+    write_results(args.output, rows)
+    print(f"Wrote {len(rows)} rows for {len(files)} family files "
+          f"to {args.output}")
+
+
+def positive_int(value):
+    """
+    Parse a command-line value that must be a positive integer.
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number <= 0:
+        raise argparse.ArgumentTypeError(
+            f"must be a positive integer, not {value!r}")
+    return number
+
+
+def family_files(source):
+    """
+    Return a list of (family, filename) pairs for the family CSV files
+    named by `source`, which is either a directory (every .csv file in
+    it) or a manifest file (one path per line, relative to the
+    manifest's directory). Raise ValueError if two files would store
+    their results under the same family name.
+    """
+    if os.path.isdir(source):
+        directory = source
+        filenames = sorted(
+            os.path.join(source, filename)
+            for filename in os.listdir(source)
+            if filename.endswith(".csv")
+        )
+    else:
+        directory = os.path.dirname(source)
+        with open(source) as f:
+            filenames = [
+                os.path.join(directory, line.strip())
+                for line in f
+                if line.strip() and not line.startswith("#")
+            ]
+
+    files = []
+    seen = dict()
+    for filename in filenames:
+        family = family_name(filename, directory)
+        if family in seen:
+            raise ValueError(f"{seen[family]} and {filename} are both "
+                             f"family {family}")
+        seen[family] = filename
+        files.append((family, filename))
+    return files
+
+
+def family_name(filename, directory):
+    """
+    Return the key results for `filename` are stored under: its path
+    relative to `directory`, without the .csv extension.
+    """
+    relative = os.path.relpath(filename, directory or os.curdir)
+    return os.path.splitext(relative)[0].replace(os.sep, "/")
+
+
+def solve(task):
+    """
+    Compute marginals for one (family, part, people, method, samples,
+    seed) task, where `part` numbers the task's people among the tasks
+    of its family, and return them as output rows.
+    """
+    family, part, people, method, samples, seed = task
+    if method == "exact":
+        probabilities = exact_inference(people)
+    else:
+        inference = (likelihood_weighting if method == "likelihood"
+                     else gibbs_sampling)
+        rng = random.Random(
+            None if seed is None else f"{seed}:{family}:{part}")
+        probabilities, _, _ = inference(people, samples, rng)
+    return [
+        [family, person,
+         probabilities[person]["gene"][2],
+         probabilities[person]["gene"][1],
+         probabilities[person]["gene"][0],
+         probabilities[person]["trait"][True],
+         probabilities[person]["trait"][False]]
+        for person in people
+    ]
+
+
+def batch(files, method="exact", samples=SAMPLES, seed=None,
+          workers=None, split=False):
+    """
+    Compute marginals for every (family, filename) pair in `files`, as
+    returned by `family_files`, over a pool of `workers` processes. If
+    `split` is set, disconnected families within one file are solved as
+    separate tasks.
+
+    Return the output rows ordered as the files are, and by person
+    order within each file.
+    """
+    work = []
+    positions = dict()
+    for family, filename in files:
+        people = load_data(filename)
+        for person in people:
+            positions[(family, person)] = len(positions)
+        parts = components(people) if split else [people]
+        for part, members in enumerate(parts):
+            work.append((family, part, members, method, samples, seed))
+
+    # Larger families first, so one slow family doesn't run alone at the end
+    work.sort(key=lambda task: len(task[2]), reverse=True)
+    with multiprocessing.Pool(workers) as pool:
+        results = pool.map(solve, work, chunksize=1)
+
+    rows = [row for result in results for row in result]
+    rows.sort(key=lambda row: positions[(row[0], row[1])])
+    return rows
+
+
+def write_results(filename, rows):
+    """
+    Write output rows as CSV with one column per marginal.
+    """
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for row in rows:
+            writer.writerow(row[:2] + [f"{p:.6f}" for p in row[2:]])
+
+
+if __name__ == "__main__":
+    main()
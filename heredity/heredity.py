@@ -1,5 +1,7 @@
 import csv
 import itertools
+import math
+import random
 import sys
 
 PROBS = {
@@ -36,16 +38,69 @@ PROBS = {
     "mutation": 0.01
 }
 
+# Default number of samples drawn by the approximate inference methods
+SAMPLES = 10000
+
+# Conditional probability tables derived from PROBS, see transmission_tables
+TABLES = dict()
+
 
 def main():
 
     # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
+    usage = ("Usage: python heredity.py data.csv "
+             "[exact|likelihood|gibbs] [samples] [seed]")
+    if len(sys.argv) not in (2, 3, 4, 5):
+        sys.exit(usage)
+    method = sys.argv[2] if len(sys.argv) > 2 else "exact"
+    if method == "exact" and len(sys.argv) > 3:
+        sys.exit("Exact inference takes no samples or seed\n" + usage)
+    try:
+        samples = int(sys.argv[3]) if len(sys.argv) > 3 else SAMPLES
+        seed = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    except ValueError:
+        sys.exit(usage)
+    if samples <= 0:
+        sys.exit("Samples must be a positive integer\n" + usage)
     people = load_data(sys.argv[1])
 
-    # Keep track of gene and trait probabilities for each person
-    probabilities = {
+    if method == "exact":
+        probabilities = exact_inference(people)
+        errors = None
+    elif method == "likelihood":
+        probabilities, errors, diagnostics = likelihood_weighting(
+            people, samples, random.Random(seed))
+        print(f"Likelihood Weighting (n = {samples}, "
+              f"effective samples = {diagnostics['ess']:.1f})")
+    elif method == "gibbs":
+        probabilities, errors, diagnostics = gibbs_sampling(
+            people, samples, random.Random(seed))
+        print(f"Gibbs Sampling (n = {samples}, "
+              f"chains = {diagnostics['chains']}, "
+              f"max R-hat = {diagnostics['rhat']:.4f})")
+    else:
+        sys.exit(f"Unknown inference method: {method}")
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                if errors is None:
+                    print(f"    {value}: {p:.4f}")
+                else:
+                    error = errors[person][field][value]
+                    print(f"    {value}: {p:.4f} ± {error:.4f}")
+
+
+def empty_probabilities(people):
+    """
+    Return a gene and trait distribution with every value set to 0
+    for each person in `people`.
+    """
+    return {
         person: {
             "gene": {
                 2: 0,
@@ -59,8 +114,16 @@ def main():
         }
         for person in people
     }
-    # print(set(people))
-    # print(powerset(set(people)))
+
+
+def exact_inference(people):
+    """
+    Compute the gene and trait distribution of every person in `people`
+    by enumerating every possible assignment of genes and traits.
+    """
+    # Keep track of gene and trait probabilities for each person
+    probabilities = empty_probabilities(people)
+
     # Loop over all sets of people who might have the trait
     names = set(people)
     for have_trait in powerset(names):
@@ -83,15 +146,148 @@ def main():
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
+    return probabilities
 
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+
+class InferenceSession():
+    """
+    Exact inference over a pedigree whose trait evidence changes over time.
+
+    The prior probability of every gene assignment is computed once per
+    family; observing or retracting a trait only reweights the
+    assignments of the affected family, and marginals are recomputed
+    only for families whose evidence changed.
+    """
+
+    def __init__(self, people):
+        self.people = {
+            person: dict(people[person]) for person in people
+        }
+        self.families = []
+        self.family_of = dict()
+        for component in components(self.people):
+            family = {
+                "names": list(component),
+                "dirty": True,
+                "marginals": None
+            }
+            for person in component:
+                self.family_of[person] = len(self.families)
+            self.families.append(family)
+
+        # Build the tables now, so the first query records their key
+        transmission_tables()
+        self.key = TABLES["key"]
+
+    def observe(self, person, trait):
+        """
+        Record that `person` does (True) or does not (False) have the trait.
+        Observing None is the same as retracting the observation.
+        """
+        if trait is None:
+            return self.retract(person)
+        if self.people[person]["trait"] is not None:
+            self.retract(person)
+        self.people[person]["trait"] = trait
+        family = self.families[self.family_of[person]]
+        if family.get("weights") is not None:
+            _, trait_table = transmission_tables()
+            i = family["names"].index(person)
+            weights = family["weights"]
+            for a, genes in enumerate(family["assignments"]):
+                weights[a] *= trait_table[(genes[i], trait)]
+        family["dirty"] = True
+
+    def retract(self, person):
+        """
+        Forget any trait observation about `person`.
+        """
+        if self.people[person]["trait"] is None:
+            return
+        self.people[person]["trait"] = None
+        family = self.families[self.family_of[person]]
+        family["weights"] = None
+        family["dirty"] = True
+
+    def probabilities(self):
+        """
+        Return the gene and trait distribution of every person, in the
+        same format as `exact_inference`.
+        """
+        transmission_tables()
+        if TABLES["key"] != self.key:
+            self.key = TABLES["key"]
+            for family in self.families:
+                family["prior"] = None
+                family["weights"] = None
+                family["dirty"] = True
+
+        # Copy the cached marginals, so callers cannot change them
+        probabilities = dict()
+        for family in self.families:
+            if family["dirty"]:
+                self.infer(family)
+            for person, marginals in family["marginals"].items():
+                probabilities[person] = {
+                    field: dict(distribution)
+                    for field, distribution in marginals.items()
+                }
+        return {person: probabilities[person] for person in self.people}
+
+    def infer(self, family):
+        """
+        Recompute the marginals of one family from its cached factors.
+        """
+        inheritance, trait_table = transmission_tables()
+        names = family["names"]
+        position = {person: i for i, person in enumerate(names)}
+
+        # Prior probability of every gene assignment, ignoring traits
+        if family.get("prior") is None:
+            family["assignments"] = list(
+                itertools.product((2, 1, 0), repeat=len(names)))
+            prior = []
+            for genes in family["assignments"]:
+                p = 1
+                for i, person in enumerate(names):
+                    mother = self.people[person]["mother"]
+                    father = self.people[person]["father"]
+                    if mother is None and father is None:
+                        p *= PROBS["gene"][genes[i]]
+                    else:
+                        p *= inheritance[(genes[position[mother]],
+                                          genes[position[father]], genes[i])]
+                prior.append(p)
+            family["prior"] = prior
+            family["weights"] = None
+
+        # Weight each assignment by the likelihood of the evidence
+        if family.get("weights") is None:
+            weights = list(family["prior"])
+            for i, person in enumerate(names):
+                trait = self.people[person]["trait"]
+                if trait is None:
+                    continue
+                for a, genes in enumerate(family["assignments"]):
+                    weights[a] *= trait_table[(genes[i], trait)]
+            family["weights"] = weights
+
+        marginals = empty_probabilities(names)
+        traits = [self.people[person]["trait"] for person in names]
+        for genes, weight in zip(family["assignments"], family["weights"]):
+            if weight == 0:
+                continue
+            for i, person in enumerate(names):
+                marginals[person]["gene"][genes[i]] += weight
+                if traits[i] is None:
+                    p = trait_table[(genes[i], True)]
+                    marginals[person]["trait"][True] += weight * p
+                    marginals[person]["trait"][False] += weight * (1 - p)
+                else:
+                    marginals[person]["trait"][traits[i]] += weight
+        normalize(marginals)
+        family["marginals"] = marginals
+        family["dirty"] = False
 
 
 def load_data(filename):
@@ -116,6 +312,32 @@ def load_data(filename):
     return data
 
 
+def components(people):
+    """
+    Split `people` into families that share no relatives.
+    Return a list of dictionaries in the same format as `people`,
+    one per connected component of the family tree.
+    """
+    # Union-find over parent-child links
+    root = {person: person for person in people}
+
+    def find(person):
+        while root[person] != person:
+            root[person] = root[root[person]]
+            person = root[person]
+        return person
+
+    for person in people:
+        for parent in (people[person]["mother"], people[person]["father"]):
+            if parent is not None:
+                root[find(person)] = find(parent)
+
+    families = dict()
+    for person in people:
+        families.setdefault(find(person), dict())[person] = people[person]
+    return list(families.values())
+
+
 def powerset(s):
     """
     Return a list of all possible subsets of set s.
@@ -139,54 +361,24 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         * everyone in set `have_trait` has the trait, and
         * everyone not in set` have_trait` does not have the trait.
     """
-    # init information for all people include gene, trait
-    properties = {
-        person: {
-            'gene': 0,
-            'trait': False,
-            'probability': 0
-        }
+    inheritance, trait_table = transmission_tables()
+    genes = {
+        person: 2 if person in two_genes else 1 if person in one_gene else 0
         for person in people
     }
-    for person in one_gene:
-        properties[person]['gene'] = 1
-    for person in two_genes:
-        properties[person]['gene'] = 2
-    for person in have_trait:
-        properties[person]['trait'] = True
 
-    # calculate probability of each person
+    # joining probability of each person to entire joint probability
+    probability = 1
     for person in people:
-        # get name
-        name = people[person]['name']
-        # get father
-        father = people[person]['father']
-        # get mother
-        mother = people[person]['mother']
-        # get copies of gene of person
-        gene_of_person = properties[person]['gene']
-        # get trait of person
-        trait_of_person = properties[person]['trait']
-        if father == None and mother == None:
-            # calculate a person has no parrent as well as person is a parent
-            properties[person]['probability'] = PROBS['gene'][gene_of_person]
-            properties[person]['probability'] *= PROBS['trait'][gene_of_person][trait_of_person]
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+        gene = genes[person]
+        if mother is None and father is None:
+            probability *= PROBS["gene"][gene]
         else:
-            # get copies of gene of father
-            gene_of_father = properties[father]['gene']
-            # get copies of gene of mother
-            gene_of_mother = properties[mother]['gene']
-            # probability when passing a copy of gene to their child
-            properties_pass_gene_father = properties_pass_gene(gene_of_father)
-            properties_pass_gene_mother = properties_pass_gene(gene_of_mother)
-            # combine probability from mother and father
-            properties[person]['probability'] = calculate_probability(
-                gene_of_person, properties_pass_gene_mother, properties_pass_gene_father)
-            # probability having trait when having an amount of copies of gene
-            properties[person]['probability'] *= PROBS['trait'][gene_of_person][trait_of_person]
-
-    # joining all probaility of each people to entire joint probability
-    return entire_joint_probability(people, properties)
+            probability *= inheritance[(genes[mother], genes[father], gene)]
+        probability *= trait_table[(gene, person in have_trait)]
+    return probability
 
 
 def update(probabilities, one_gene, two_genes, have_trait, p):
@@ -234,14 +426,6 @@ def properties_pass_gene(gene):
     return (1 - PROBS['mutation'])
 
 
-def entire_joint_probability(people, properties):
-    # combine all probabilities of person
-    final_probability = 1
-    for person in people:
-        final_probability *= properties[person]['probability']
-    return final_probability
-
-
 def calculate_probability(gene, properties_pass_gene_mother, properties_pass_gene_father):
     # calculate probability when knowing gene, passing gene probability of parent
     if gene == 1:
@@ -251,5 +435,304 @@ def calculate_probability(gene, properties_pass_gene_mother, properties_pass_gen
     return (1 - properties_pass_gene_mother) * (1 - properties_pass_gene_father)
 
 
+def transmission_tables():
+    """
+    Return the conditional probability tables used by every inference
+    method, built once from `PROBS`:
+        * `inheritance` maps (mother genes, father genes, child genes)
+          to the probability of the child having that many copies, and
+        * `trait` maps (genes, trait) to the probability of the trait.
+    The tables are rebuilt whenever the values in `PROBS` change. Their
+    key also covers the unconditional gene probabilities, which the
+    tables do not use, because `InferenceSession` caches priors built
+    from them under the same key.
+    """
+    key = (
+        PROBS["mutation"],
+        tuple(PROBS["gene"][gene] for gene in (2, 1, 0)),
+        tuple(PROBS["trait"][gene][trait]
+              for gene in (2, 1, 0) for trait in (True, False))
+    )
+    if TABLES.get("key") != key:
+        inheritance = dict()
+        distributions = dict()
+        for gene_of_mother in (2, 1, 0):
+            for gene_of_father in (2, 1, 0):
+                properties_pass_gene_mother = properties_pass_gene(
+                    gene_of_mother)
+                properties_pass_gene_father = properties_pass_gene(
+                    gene_of_father)
+                distribution = dict()
+                for gene in (2, 1, 0):
+                    distribution[gene] = calculate_probability(
+                        gene, properties_pass_gene_mother,
+                        properties_pass_gene_father)
+                    inheritance[(gene_of_mother, gene_of_father, gene)] = (
+                        distribution[gene])
+                distributions[(gene_of_mother, gene_of_father)] = distribution
+        trait = {
+            (gene, value): PROBS["trait"][gene][value]
+            for gene in (2, 1, 0)
+            for value in (True, False)
+        }
+        TABLES.update(key=key, inheritance=inheritance, trait=trait,
+                      distributions=distributions)
+    return TABLES["inheritance"], TABLES["trait"]
+
+
+def inheritance_distribution(gene_of_mother, gene_of_father):
+    """
+    Return the probability distribution over the number of copies of the
+    gene a child has, given the number of copies each parent has.
+    """
+    transmission_tables()
+    return TABLES["distributions"][(gene_of_mother, gene_of_father)]
+
+
+def gene_distribution(people, person, genes):
+    """
+    Return the probability distribution over the number of copies of the
+    gene `person` has, given the copies in `genes` of their parents.
+    """
+    mother = people[person]["mother"]
+    father = people[person]["father"]
+    if mother is None and father is None:
+        return PROBS["gene"]
+    return inheritance_distribution(genes[mother], genes[father])
+
+
+def sample_distribution(distribution, rng):
+    """
+    Draw one value from a discrete `distribution` mapping values to
+    (not necessarily normalized) weights.
+    """
+    total = sum(distribution.values())
+    r = rng.random() * total
+    for value, weight in distribution.items():
+        r -= weight
+        if r < 0:
+            return value
+    return value
+
+
+def topological_order(people):
+    """
+    Return the people in an order where every person comes after
+    their mother and father.
+    """
+    order = []
+    visited = set()
+
+    def visit(person):
+        if person in visited:
+            return
+        visited.add(person)
+        for parent in (people[person]["mother"], people[person]["father"]):
+            if parent is not None:
+                visit(parent)
+        order.append(person)
+
+    for person in people:
+        visit(person)
+    return order
+
+
+def likelihood_weighting(people, samples=SAMPLES, rng=None):
+    """
+    Estimate the gene and trait distribution of every person in `people`
+    by likelihood weighting.
+
+    Genes are sampled from parents to children; observed traits are not
+    sampled but weight the sample by their likelihood. Return the
+    estimated `probabilities`, the standard error of each estimate, and
+    a dictionary of diagnostics holding the effective sample size.
+    """
+    rng = rng or random.Random()
+    _, trait_table = transmission_tables()
+    order = topological_order(people)
+    sums = empty_probabilities(people)
+    squares = empty_probabilities(people)
+    total_weight = 0
+    total_squared_weight = 0
+
+    for _ in range(samples):
+        genes = dict()
+        traits = dict()
+        weight = 1
+        for person in order:
+            genes[person] = sample_distribution(
+                gene_distribution(people, person, genes), rng)
+            trait = people[person]["trait"]
+            if trait is None:
+                traits[person] = sample_distribution(
+                    PROBS["trait"][genes[person]], rng)
+            else:
+                traits[person] = trait
+                weight *= trait_table[(genes[person], trait)]
+
+        for person in people:
+            sums[person]["gene"][genes[person]] += weight
+            sums[person]["trait"][traits[person]] += weight
+            squares[person]["gene"][genes[person]] += weight ** 2
+            squares[person]["trait"][traits[person]] += weight ** 2
+        total_weight += weight
+        total_squared_weight += weight ** 2
+
+    if total_weight == 0:
+        raise ValueError("no sample is consistent with the evidence")
+
+    # Weighted estimate of each marginal, with the standard error of a
+    # ratio estimator from the delta method:
+    # sum of w^2 (I - p)^2 = sum w^2 I - 2 p sum w^2 I + p^2 sum w^2
+    probabilities = empty_probabilities(people)
+    errors = empty_probabilities(people)
+    for person in people:
+        for field in sums[person]:
+            for value in sums[person][field]:
+                p = sums[person][field][value] / total_weight
+                squared = squares[person][field][value]
+                deviation = (squared * (1 - 2 * p)
+                             + p ** 2 * total_squared_weight)
+                probabilities[person][field][value] = p
+                errors[person][field][value] = (
+                    math.sqrt(max(deviation, 0)) / total_weight)
+
+    diagnostics = {"ess": total_weight ** 2 / total_squared_weight}
+    return probabilities, errors, diagnostics
+
+
+def gibbs_sampling(people, samples=SAMPLES, rng=None, chains=4, batches=20):
+    """
+    Estimate the gene and trait distribution of every person in `people`
+    by Gibbs sampling.
+
+    `samples` sweeps are split over `chains` independent chains, each
+    started from a forward sample and run for a tenth of its sweeps as
+    burn-in. Every sweep resamples each person's gene from its
+    conditional distribution given everyone else; the conditional
+    distributions themselves are averaged (Rao-Blackwellized) into the
+    estimates. Return the estimated `probabilities`, standard errors
+    from batch means, and a dictionary of diagnostics holding the
+    number of chains and the largest Gelman-Rubin R-hat.
+    """
+    rng = rng or random.Random()
+    _, trait_table = transmission_tables()
+    order = topological_order(people)
+    children = {person: [] for person in people}
+    for person in people:
+        if people[person]["mother"] is not None:
+            children[people[person]["mother"]].append(person)
+            children[people[person]["father"]].append(person)
+
+    sweeps = max(samples // chains, 2)
+    burn_in = sweeps // 10
+    batch_size = max(sweeps // batches, 1)
+    quantities = [
+        (person, field, value)
+        for person in people
+        for field, values in (("gene", (2, 1, 0)), ("trait", (True, False)))
+        for value in values
+    ]
+
+    chain_means = []
+    chain_variances = []
+    batch_means = []
+    for _ in range(chains):
+
+        # Start from a forward sample of the prior
+        genes = dict()
+        for person in order:
+            genes[person] = sample_distribution(
+                gene_distribution(people, person, genes), rng)
+
+        sums = dict.fromkeys(quantities, 0)
+        squares = dict.fromkeys(quantities, 0)
+        batch = dict.fromkeys(quantities, 0)
+        for sweep in range(burn_in + sweeps):
+            current = dict()
+            for person in order:
+                conditional = gibbs_conditional(
+                    people, children, person, genes)
+                total = sum(conditional.values())
+                genes[person] = sample_distribution(conditional, rng)
+                for gene in conditional:
+                    current[(person, "gene", gene)] = conditional[gene] / total
+
+            if sweep < burn_in:
+                continue
+
+            for person in people:
+                trait = people[person]["trait"]
+                for value in (True, False):
+                    if trait is None:
+                        p = trait_table[(genes[person], value)]
+                    else:
+                        p = 1 if trait == value else 0
+                    current[(person, "trait", value)] = p
+
+            for quantity in quantities:
+                sums[quantity] += current[quantity]
+                squares[quantity] += current[quantity] ** 2
+                batch[quantity] += current[quantity]
+            if (sweep - burn_in + 1) % batch_size == 0:
+                batch_means.append(
+                    {q: batch[q] / batch_size for q in quantities})
+                batch = dict.fromkeys(quantities, 0)
+
+        means = {q: sums[q] / sweeps for q in quantities}
+        chain_means.append(means)
+        chain_variances.append({
+            q: max(squares[q] / sweeps - means[q] ** 2, 0) * sweeps / (sweeps - 1)
+            for q in quantities
+        })
+
+    probabilities = empty_probabilities(people)
+    errors = empty_probabilities(people)
+    rhat = 1
+    for quantity in quantities:
+        person, field, value = quantity
+        means = [chain[quantity] for chain in chain_means]
+        mean = sum(means) / chains
+        probabilities[person][field][value] = mean
+
+        # Standard error from the spread of batch means
+        values = [batch[quantity] for batch in batch_means]
+        spread = sum((v - mean) ** 2 for v in values) / (len(values) - 1)
+        errors[person][field][value] = math.sqrt(spread / len(values))
+
+        # Gelman-Rubin potential scale reduction factor
+        within = sum(chain[quantity] for chain in chain_variances) / chains
+        if chains > 1 and within > 0:
+            between = sum((m - mean) ** 2 for m in means) / (chains - 1)
+            pooled = (sweeps - 1) / sweeps * within + between
+            rhat = max(rhat, math.sqrt(pooled / within))
+
+    diagnostics = {"chains": chains, "rhat": rhat}
+    return probabilities, errors, diagnostics
+
+
+def gibbs_conditional(people, children, person, genes):
+    """
+    Return the unnormalized distribution over the copies of the gene
+    `person` has, given the genes of everyone else and the evidence.
+    """
+    inheritance, trait_table = transmission_tables()
+    prior = gene_distribution(people, person, genes)
+    trait = people[person]["trait"]
+    conditional = dict()
+    for gene in (2, 1, 0):
+        p = prior[gene]
+        if trait is not None:
+            p *= trait_table[(gene, trait)]
+        for child in children[person]:
+            mother = people[child]["mother"]
+            father = people[child]["father"]
+            gene_of_mother = gene if mother == person else genes[mother]
+            gene_of_father = gene if father == person else genes[father]
+            p *= inheritance[(gene_of_mother, gene_of_father, genes[child])]
+        conditional[gene] = p
+    return conditional
+
+
 if __name__ == "__main__":
     main()
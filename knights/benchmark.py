@@ -0,0 +1,296 @@
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from logic import *
+from loader import dimacs_knowledge, load_dimacs, load_formulas
+from sat import entails_all
+
+# Claims a character can make about other characters, by number of operands
+CONNECTIVES = [Not, And, Or, Implication, Biconditional]
+
+# Largest number of symbols each method is run on; None for no limit
+LIMITS = {
+    "enumerate": 16,
+    "bitwise": 24,
+    "pruning": None,
+    "sat": None
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark model checking on random "
+                    "knights-and-knaves puzzles.")
+    parser.add_argument("--characters", type=int, nargs="+", default=[3],
+                        help="numbers of characters to generate puzzles for")
+    parser.add_argument("--statements", type=int, default=None,
+                        help="statements per puzzle "
+                             "(default: one per character)")
+    parser.add_argument("--depth", type=int, default=2,
+                        help="nesting depth of each statement; "
+                             "higher is harder")
+    parser.add_argument("--puzzles", type=int, default=5,
+                        help="puzzles per number of characters")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--unique", action="store_true",
+                        help="only keep puzzles with exactly one solution")
+    parser.add_argument("--methods", nargs="+", default=list(LIMITS),
+                        choices=list(LIMITS))
+    parser.add_argument("--output", default=None,
+                        help="JSON lines file to write results to "
+                             "(default: standard output)")
+    commands = parser.add_subparsers(dest="command")
+    parsing = commands.add_parser(
+        "parse", help="loader throughput on formula and DIMACS files; "
+                      "--depth, --seed and --output, given before parse, "
+                      "also apply")
+    parsing.add_argument("files", nargs="*",
+                         help="files to load, DIMACS if they end in .cnf "
+                              "and formulas otherwise (default: generate "
+                              "random ones)")
+    parsing.add_argument("--formulas", type=int, default=20000,
+                         help="random formulas to generate")
+    parsing.add_argument("--clauses", type=int, default=200000,
+                         help="random 3-literal DIMACS clauses to generate")
+    parsing.add_argument("--variables", type=int, default=10000,
+                         help="variables of the random DIMACS clauses")
+    args = parser.parse_args()
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        if args.command == "parse":
+            for result in parse_benchmark(args.files, args.formulas,
+                                          args.clauses, args.variables,
+                                          args.depth, args.seed):
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+            return
+        for characters in args.characters:
+            statements = args.statements or characters
+            for i in range(args.puzzles):
+                seed = f"{args.seed}-{characters}-{statements}-{args.depth}-{i}"
+                rng = random.Random(seed)
+                puzzle = generate(characters, statements, args.depth, rng,
+                                  args.unique)
+                for result in benchmark(puzzle, args.methods):
+                    result.update(seed=seed, puzzle=i)
+                    output.write(json.dumps(result) + "\n")
+                    output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+def character_names(n):
+    """Returns `n` character names: A to Z, then C27, C28, ..."""
+    return [
+        string.ascii_uppercase[i] if i < 26 else f"C{i + 1}"
+        for i in range(n)
+    ]
+
+
+def claim(knights, depth, rng):
+    """Returns a random claim about which characters are knights, with
+    connectives nested `depth` deep. At depth 0 the claim is that one
+    character is a knight, or that one is a knave."""
+    if depth == 0:
+        name = rng.choice(list(knights))
+        if rng.random() < 0.5:
+            return knights[name]
+        return Not(knights[name])
+    connective = rng.choice(CONNECTIVES)
+    if connective is Not:
+        return Not(claim(knights, depth - 1, rng))
+    return connective(claim(knights, depth - 1, rng),
+                      claim(knights, depth - 1, rng))
+
+
+def generate(characters, statements, depth, rng, unique=False,
+             attempts=1000):
+    """
+    Returns a random knights-and-knaves puzzle as a dict with
+    "characters", "statements", "depth", "knowledge" (a sentence),
+    "symbols" (whether each character is a knight or a knave) and
+    "formulas" (each statement, as a formula).
+
+    Each statement is made by a random character and nests `depth`
+    connectives over claims about the characters. A knight's statement
+    is true and a knave's is false. Puzzles are redrawn until they have
+    a solution, and if `unique`, until they have exactly one.
+    """
+    names = character_names(characters)
+    knights = {name: Symbol(f"{name} is a Knight") for name in names}
+    knaves = {name: Symbol(f"{name} is a Knave") for name in names}
+    symbols = list(knights.values()) + list(knaves.values())
+
+    for _ in range(attempts):
+        knowledge = And(*[
+            Biconditional(knights[name], Not(knaves[name])) for name in names
+        ])
+        formulas = []
+        for _ in range(statements):
+            speaker = rng.choice(names)
+            statement = claim(knights, depth, rng)
+            formulas.append(f"{speaker} says {statement.formula()}")
+            knowledge.add(Biconditional(knights[speaker], statement))
+
+        # Every character is known to be one or the other only if the
+        # puzzle has exactly one solution
+        entailed = entails_all(knowledge, symbols + [Or()])
+        if entailed[Or()]:
+            continue
+        if unique and sum(entailed[symbol] for symbol in symbols) != characters:
+            continue
+        return {
+            "characters": characters,
+            "statements": statements,
+            "depth": depth,
+            "knowledge": knowledge,
+            "symbols": symbols,
+            "formulas": formulas
+        }
+    raise ValueError(f"no puzzle found in {attempts} attempts")
+
+
+def solve(method, knowledge, symbols):
+    """Returns the symbols that knowledge base entails, using `method`,
+    and the number of search nodes visited (None if not counted)."""
+    if method == "enumerate":
+        return [s for s in symbols if model_check(knowledge, s)], None
+    if method == "bitwise":
+        entailed = model_check_all(knowledge, symbols)
+        return [s for s in symbols if entailed[s]], None
+    if method == "pruning":
+        stats = dict()
+        entailed = [s for s in symbols
+                    if model_check_pruning(knowledge, s, stats)]
+        return entailed, stats["nodes"]
+    if method == "sat":
+        entailed = entails_all(knowledge, symbols)
+        return [s for s in symbols if entailed[s]], None
+    raise ValueError(f"unknown method {method}")
+
+
+def benchmark(puzzle, methods):
+    """
+    Solves `puzzle` with each of `methods`, returning one result dict
+    per method with its running time in seconds, search nodes, peak
+    memory allocated in bytes and the names of the entailed symbols.
+    Methods over their limit in LIMITS are reported as skipped.
+    """
+    knowledge = puzzle["knowledge"]
+    symbols = puzzle["symbols"]
+    results = []
+    for method in methods:
+        result = {
+            "method": method,
+            "characters": puzzle["characters"],
+            "statements": puzzle["statements"],
+            "depth": puzzle["depth"],
+            "symbols": len(symbols)
+        }
+        results.append(result)
+        limit = LIMITS[method]
+        if limit is not None and len(symbols) > limit:
+            result["skipped"] = True
+            continue
+
+        # Time without tracing allocations, which slows Python down
+        start = time.perf_counter()
+        entailed, nodes = solve(method, knowledge, symbols)
+        result["seconds"] = time.perf_counter() - start
+
+        # Measure memory in a second, traced run
+        tracemalloc.start()
+        solve(method, knowledge, symbols)
+        result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        result["nodes"] = nodes
+        result["entailed"] = sorted(symbol.name for symbol in entailed)
+    return results
+
+
+def write_formulas(filename, count, depth, rng):
+    """Writes `count` random statements by 100 characters, one formula
+    per line, with connectives nested `depth` deep."""
+    names = character_names(100)
+    knights = {name: Symbol(f"{name} is a Knight") for name in names}
+    with open(filename, "w", encoding="utf-8") as f:
+        for _ in range(count):
+            speaker = knights[rng.choice(names)]
+            statement = Biconditional(speaker, claim(knights, depth, rng))
+            f.write(statement.formula() + "\n")
+
+
+def write_dimacs(filename, clauses, variables, rng):
+    """Writes a DIMACS CNF file of `clauses` random 3-literal clauses
+    over `variables` variables."""
+    with open(filename, "w") as f:
+        f.write(f"p cnf {variables} {clauses}\n")
+        for _ in range(clauses):
+            f.write(" ".join(
+                str(rng.choice((1, -1)) * rng.randint(1, variables))
+                for _ in range(3)
+            ) + " 0\n")
+
+
+def time_loader(loader, filename):
+    """Returns the number of items `loader` yields or, if it returns a
+    conjunction, the number of its conjuncts, and the seconds taken."""
+    start = time.perf_counter()
+    loaded = loader(filename)
+    if isinstance(loaded, And):
+        count = len(loaded.conjuncts)
+    else:
+        count = sum(1 for _ in loaded)
+    return count, time.perf_counter() - start
+
+
+def parse_benchmark(files, formulas, clauses, variables, depth, seed):
+    """
+    Times the loaders on each of `files`, or on a generated file of
+    `formulas` random formulas and one of `clauses` random DIMACS
+    clauses if `files` is empty. Returns one result dict per loader and
+    file, with the items loaded, the seconds taken and the items and
+    megabytes per second: formulas for load_formulas, and clauses for
+    load_dimacs and dimacs_knowledge.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        if not files:
+            rng = random.Random(seed)
+            files = [os.path.join(directory, "formulas.txt"),
+                     os.path.join(directory, "clauses.cnf")]
+            write_formulas(files[0], formulas, depth, rng)
+            write_dimacs(files[1], clauses, variables, rng)
+
+        results = []
+        for filename in files:
+            if filename.endswith(".cnf"):
+                loaders = [load_dimacs, dimacs_knowledge]
+            else:
+                loaders = [load_formulas]
+            size = os.path.getsize(filename)
+            for loader in loaders:
+                count, seconds = time_loader(loader, filename)
+                results.append({
+                    "loader": loader.__name__,
+                    "file": os.path.basename(filename),
+                    "bytes": size,
+                    "items": count,
+                    "seconds": seconds,
+                    "items_per_second": count / seconds,
+                    "mb_per_second": size / seconds / 1e6
+                })
+        return results
+
+
+if __name__ == "__main__":
+    main()
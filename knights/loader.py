@@ -0,0 +1,165 @@
+import re
+
+from logic import *
+
+# Operators accepted in formulas, as written by Sentence.formula() and
+# in plain ASCII
+NOT = {"¬", "~", "!"}
+AND = {"∧", "&"}
+OR = {"∨", "|"}
+IMPLIES = "=>"
+IFF = "<=>"
+
+TOKEN = re.compile(r"<=>|=>|[¬~!∧&∨|()]|[^¬~!∧&∨|()<=]+")
+
+# Marks the end of the tokens of a formula
+END = ""
+
+# Tokens that cannot start a formula
+OPERATORS = AND | OR | {")", IMPLIES, IFF, END}
+
+
+def tokenize(text):
+    """Returns the list of operators, parentheses and symbol names in
+    `text`. Symbol names may contain spaces, as in "A is a Knight"."""
+    tokens = TOKEN.findall(text)
+    if sum(map(len, tokens)) != len(text):
+        raise SyntaxError(f"unexpected character in formula: {text!r}")
+    tokens = [token.strip() for token in tokens]
+    return [token for token in tokens if token]
+
+
+class Parser():
+    """
+    Recursive descent parser for logical formulas.
+
+    From loosest to tightest binding: <=> (left associative),
+    => (right associative), ∨, ∧, ¬. Anything else between operators
+    and parentheses is a symbol name.
+    """
+
+    def __init__(self, text):
+        self.tokens = tokenize(text) + [END]
+        self.position = 0
+
+    def parse(self):
+        if len(self.tokens) == 1:
+            raise SyntaxError("empty formula")
+        sentence = self.biconditional()
+        if self.tokens[self.position] != END:
+            raise SyntaxError(
+                f"unexpected {self.tokens[self.position]!r} in formula")
+        return sentence
+
+    def biconditional(self):
+        sentence = self.implication()
+        while self.tokens[self.position] == IFF:
+            self.position += 1
+            sentence = Biconditional(sentence, self.implication())
+        return sentence
+
+    def implication(self):
+        sentence = self.disjunction()
+        if self.tokens[self.position] == IMPLIES:
+            self.position += 1
+            sentence = Implication(sentence, self.implication())
+        return sentence
+
+    def disjunction(self):
+        sentence = self.conjunction()
+        if self.tokens[self.position] not in OR:
+            return sentence
+        disjuncts = [sentence]
+        while self.tokens[self.position] in OR:
+            self.position += 1
+            disjuncts.append(self.conjunction())
+        return Or(*disjuncts)
+
+    def conjunction(self):
+        sentence = self.negation()
+        if self.tokens[self.position] not in AND:
+            return sentence
+        conjuncts = [sentence]
+        while self.tokens[self.position] in AND:
+            self.position += 1
+            conjuncts.append(self.negation())
+        return And(*conjuncts)
+
+    def negation(self):
+        token = self.tokens[self.position]
+        self.position += 1
+        if token in NOT:
+            return Not(self.negation())
+        if token == "(":
+            sentence = self.biconditional()
+            if self.tokens[self.position] != ")":
+                raise SyntaxError("missing closing parenthesis")
+            self.position += 1
+            return sentence
+        if token in OPERATORS:
+            if token == END:
+                raise SyntaxError("formula ends unexpectedly")
+            raise SyntaxError(f"unexpected {token!r} in formula")
+        return Symbol(token)
+
+
+def parse(text):
+    """Parses a formula, such as one returned by Sentence.formula()."""
+    return Parser(text).parse()
+
+
+def load_formulas(filename):
+    """Yields the sentence on each line of a file, one formula per line.
+    Blank lines and lines starting with # are skipped. The file is read
+    one line at a time."""
+    with open(filename, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                yield parse(line)
+            except SyntaxError as e:
+                raise SyntaxError(f"{filename}, line {number}: {e}")
+
+
+def load_knowledge(filename):
+    """Returns the conjunction of every formula in a file."""
+    knowledge = And()
+    for sentence in load_formulas(filename):
+        knowledge.add(sentence)
+    return knowledge
+
+
+def load_dimacs(filename):
+    """Yields each clause of a DIMACS CNF file as a list of non-zero
+    integers, reading one line at a time. The clauses can be passed
+    straight to sat.Solver without building sentences."""
+    clause = []
+    with open(filename) as f:
+        for line in f:
+            if line.startswith("%"):
+                break
+            if line.startswith(("c", "p")):
+                continue
+            for literal in map(int, line.split()):
+                if literal == 0:
+                    yield clause
+                    clause = []
+                else:
+                    clause.append(literal)
+    if clause:
+        yield clause
+
+
+def dimacs_knowledge(filename, prefix="x"):
+    """Returns the clauses of a DIMACS CNF file as a conjunction of
+    disjunctions, with variable n named `prefix` followed by n."""
+    knowledge = And()
+    for clause in load_dimacs(filename):
+        knowledge.add(Or(*[
+            Symbol(f"{prefix}{literal}") if literal > 0
+            else Not(Symbol(f"{prefix}{-literal}"))
+            for literal in clause
+        ]))
+    return knowledge
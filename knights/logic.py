@@ -1,7 +1,38 @@
 import itertools
+import multiprocessing
+import os
+import weakref
+
+# Live sentences, keyed by class and operands (see Sentence)
+_interned = dict()
+
+
+def _forget(ref):
+    """Drops a sentence from the intern table once it is garbage."""
+    if _interned.get(ref.key) is ref:
+        del _interned[ref.key]
+
+
+def _lookup(key):
+    """Returns the live sentence interned under `key`, or None."""
+    ref = _interned.get(key)
+    return None if ref is None else ref()
 
 
 class Sentence():
+    """
+    Logical sentences are immutable and hash-consed: constructing a
+    sentence structurally identical to a live one returns that same
+    object, so shared subformulas are stored once, and equality and
+    hashing are by identity. Each node computes its symbol set the
+    first time it is asked for.
+
+    The one exception is a conjunction built by `And(...)`, which stays
+    a private, growable knowledge base (see `And.add`) until it is used
+    inside another sentence, where a shared frozen copy is used instead.
+    """
+
+    __slots__ = ("_symbols", "__weakref__")
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
@@ -11,15 +42,86 @@ class Sentence():
         """Returns string formula representing logical sentence."""
         return ""
 
+    def children(self):
+        """Returns the sentences this sentence is built from."""
+        return ()
+
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
-        return set()
+        if self._symbols is None:
+            self._symbols = Sentence.gather([self])
+        return set(self._symbols)
+
+    def partial(self, model):
+        """Evaluates the logical sentence in a partial model, returning
+        True, False, or None if its value depends on unassigned symbols."""
+        raise Exception("nothing to evaluate")
+
+    def expression(self, index):
+        """Returns Python source evaluating the sentence on a list `m` of
+        truth values, where `index` maps symbol names to list positions."""
+        raise Exception("nothing to compile")
+
+    def bits(self, columns, mask):
+        """Evaluates the logical sentence in every model at once.
+
+        `columns` maps each symbol name to an integer whose k-th bit is
+        the symbol's truth value in model k; `mask` has one bit set per
+        model. Returns the integer whose k-th bit is the sentence's
+        truth value in model k.
+        """
+        raise Exception("nothing to evaluate")
+
+    def compile(self, symbols=None):
+        """Compiles the logical sentence into a function of a sequence of
+        truth values, ordered as `symbols` (all symbols, sorted, by default).
+
+        The function returns the same result as `evaluate` on the model
+        mapping each symbol to its truth value, without walking the tree.
+        """
+        if symbols is None:
+            symbols = sorted(self.symbols())
+        index = {symbol: i for i, symbol in enumerate(symbols)}
+        try:
+            return eval(f"lambda m: {self.expression(index)}")
+        except (RecursionError, SyntaxError, MemoryError):
+            # Too deeply nested for the Python parser
+            return lambda m: self.evaluate(dict(zip(symbols, m)))
 
     @classmethod
     def validate(cls, sentence):
         if not isinstance(sentence, Sentence):
             raise TypeError("must be a logical sentence")
 
+    @classmethod
+    def share(cls, sentence):
+        """Validates a sentence used inside another sentence and returns
+        its shared, immutable form."""
+        if type(sentence) is And and not sentence.frozen:
+            return And.shared(sentence.conjuncts)
+        Sentence.validate(sentence)
+        return sentence
+
+    @classmethod
+    def gather(cls, sentences):
+        """Returns the frozenset of symbols in `sentences`, visiting each
+        shared subformula once."""
+        names = set()
+        seen = set()
+        stack = list(sentences)
+        while stack:
+            sentence = stack.pop()
+            if id(sentence) in seen:
+                continue
+            seen.add(id(sentence))
+            if sentence._symbols is not None:
+                names.update(sentence._symbols)
+            elif isinstance(sentence, Symbol):
+                names.add(sentence.name)
+            else:
+                stack.extend(sentence.children())
+        return frozenset(names)
+
     @classmethod
     def parenthesize(cls, s):
         """Parenthesizes an expression if not already parenthesized."""
@@ -43,15 +145,20 @@ class Sentence():
 
 
 class Symbol(Sentence):
+    __slots__ = ("name",)
 
-    def __init__(self, name):
-        self.name = name
+    def __new__(cls, name):
+        key = (cls, name)
+        self = _lookup(key)
+        if self is None:
+            self = object.__new__(cls)
+            self.name = name
+            self._symbols = None
+            _interned[key] = weakref.KeyedRef(self, _forget, key)
+        return self
 
-    def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
-
-    def __hash__(self):
-        return hash(("symbol", self.name))
+    def __reduce__(self):
+        return (Symbol, (self.name,))
 
     def __repr__(self):
         return self.name
@@ -68,17 +175,39 @@ class Symbol(Sentence):
     def symbols(self):
         return {self.name}
 
+    def partial(self, model):
+        value = model.get(self.name)
+        return None if value is None else bool(value)
 
-class Not(Sentence):
-    def __init__(self, operand):
-        Sentence.validate(operand)
-        self.operand = operand
+    def bits(self, columns, mask):
+        try:
+            return columns[self.name]
+        except KeyError:
+            raise Exception(f"variable {self.name} not in model")
 
-    def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+    def expression(self, index):
+        try:
+            return f"m[{index[self.name]}]"
+        except KeyError:
+            raise Exception(f"variable {self.name} not in model")
 
-    def __hash__(self):
-        return hash(("not", hash(self.operand)))
+
+class Not(Sentence):
+    __slots__ = ("operand",)
+
+    def __new__(cls, operand):
+        operand = Sentence.share(operand)
+        key = (cls, operand)
+        self = _lookup(key)
+        if self is None:
+            self = object.__new__(cls)
+            self.operand = operand
+            self._symbols = None
+            _interned[key] = weakref.KeyedRef(self, _forget, key)
+        return self
+
+    def __reduce__(self):
+        return (Not, (self.operand,))
 
     def __repr__(self):
         return f"Not({self.operand})"
@@ -89,23 +218,61 @@ class Not(Sentence):
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
-    def symbols(self):
-        return self.operand.symbols()
+    def children(self):
+        return (self.operand,)
+
+    def partial(self, model):
+        value = self.operand.partial(model)
+        return None if value is None else not value
+
+    def bits(self, columns, mask):
+        return mask ^ self.operand.bits(columns, mask)
+
+    def expression(self, index):
+        return f"(not {self.operand.expression(index)})"
 
 
 class And(Sentence):
-    def __init__(self, *conjuncts):
-        for conjunct in conjuncts:
-            Sentence.validate(conjunct)
-        self.conjuncts = list(conjuncts)
+    __slots__ = ("conjuncts", "frozen", "_hash")
+
+    def __new__(cls, *conjuncts):
+        self = object.__new__(cls)
+        self.conjuncts = [Sentence.share(conjunct) for conjunct in conjuncts]
+        self.frozen = False
+        self._hash = None
+        self._symbols = None
+        return self
+
+    @classmethod
+    def shared(cls, conjuncts):
+        """Returns the immutable, hash-consed conjunction of `conjuncts`."""
+        conjuncts = tuple(conjuncts)
+        key = (cls, conjuncts)
+        self = _lookup(key)
+        if self is None:
+            self = object.__new__(cls)
+            self.conjuncts = conjuncts
+            self.frozen = True
+            self._hash = hash(("and", tuple(map(id, conjuncts))))
+            self._symbols = None
+            _interned[key] = weakref.KeyedRef(self, _forget, key)
+        return self
+
+    def __reduce__(self):
+        return (And, tuple(self.conjuncts))
 
     def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+        if self is other:
+            return True
+        return (isinstance(other, And)
+                and len(self.conjuncts) == len(other.conjuncts)
+                and all(a is b for a, b in zip(self.conjuncts,
+                                               other.conjuncts)))
 
     def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
-        )
+        if self._hash is None:
+            self._hash = hash(("and", tuple(map(id, self.conjuncts))))
+        return self._hash
 
     def __repr__(self):
         conjunctions = ", ".join(
@@ -114,8 +281,13 @@ class And(Sentence):
         return f"And({conjunctions})"
 
     def add(self, conjunct):
-        Sentence.validate(conjunct)
+        if self.frozen:
+            raise TypeError("cannot add to a conjunction inside a sentence")
+        conjunct = Sentence.share(conjunct)
         self.conjuncts.append(conjunct)
+        self._hash = None
+        if self._symbols is not None:
+            self._symbols |= Sentence.gather([conjunct])
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
@@ -126,23 +298,51 @@ class And(Sentence):
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    def children(self):
+        return self.conjuncts
+
+    def partial(self, model):
+        result = True
+        for conjunct in self.conjuncts:
+            value = conjunct.partial(model)
+            if value is False:
+                return False
+            if value is None:
+                result = None
+        return result
+
+    def bits(self, columns, mask):
+        result = mask
+        for conjunct in self.conjuncts:
+            result &= conjunct.bits(columns, mask)
+            if not result:
+                break
+        return result
+
+    def expression(self, index):
+        if not self.conjuncts:
+            return "True"
+        return "(" + " and ".join(
+            [conjunct.expression(index) for conjunct in self.conjuncts]
+        ) + ")"
 
 
 class Or(Sentence):
-    def __init__(self, *disjuncts):
-        for disjunct in disjuncts:
-            Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
-
-    def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
-
-    def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
-        )
+    __slots__ = ("disjuncts",)
+
+    def __new__(cls, *disjuncts):
+        disjuncts = tuple(Sentence.share(disjunct) for disjunct in disjuncts)
+        key = (cls, disjuncts)
+        self = _lookup(key)
+        if self is None:
+            self = object.__new__(cls)
+            self.disjuncts = disjuncts
+            self._symbols = None
+            _interned[key] = weakref.KeyedRef(self, _forget, key)
+        return self
+
+    def __reduce__(self):
+        return (Or, self.disjuncts)
 
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
@@ -157,24 +357,53 @@ class Or(Sentence):
         return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
                             for disjunct in self.disjuncts])
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    def children(self):
+        return self.disjuncts
+
+    def partial(self, model):
+        result = False
+        for disjunct in self.disjuncts:
+            value = disjunct.partial(model)
+            if value is True:
+                return True
+            if value is None:
+                result = None
+        return result
+
+    def bits(self, columns, mask):
+        result = 0
+        for disjunct in self.disjuncts:
+            result |= disjunct.bits(columns, mask)
+            if result == mask:
+                break
+        return result
+
+    def expression(self, index):
+        if not self.disjuncts:
+            return "False"
+        return "(" + " or ".join(
+            [disjunct.expression(index) for disjunct in self.disjuncts]
+        ) + ")"
 
 
 class Implication(Sentence):
-    def __init__(self, antecedent, consequent):
-        Sentence.validate(antecedent)
-        Sentence.validate(consequent)
-        self.antecedent = antecedent
-        self.consequent = consequent
-
-    def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
-
-    def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+    __slots__ = ("antecedent", "consequent")
+
+    def __new__(cls, antecedent, consequent):
+        antecedent = Sentence.share(antecedent)
+        consequent = Sentence.share(consequent)
+        key = (cls, antecedent, consequent)
+        self = _lookup(key)
+        if self is None:
+            self = object.__new__(cls)
+            self.antecedent = antecedent
+            self.consequent = consequent
+            self._symbols = None
+            _interned[key] = weakref.KeyedRef(self, _forget, key)
+        return self
+
+    def __reduce__(self):
+        return (Implication, (self.antecedent, self.consequent))
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
@@ -188,24 +417,48 @@ class Implication(Sentence):
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def children(self):
+        return (self.antecedent, self.consequent)
+
+    def partial(self, model):
+        antecedent = self.antecedent.partial(model)
+        if antecedent is False:
+            return True
+        consequent = self.consequent.partial(model)
+        if consequent is True:
+            return True
+        if antecedent is None or consequent is None:
+            return None
+        return False
 
+    def bits(self, columns, mask):
+        antecedent = self.antecedent.bits(columns, mask)
+        return (mask ^ antecedent) | self.consequent.bits(columns, mask)
 
-class Biconditional(Sentence):
-    def __init__(self, left, right):
-        Sentence.validate(left)
-        Sentence.validate(right)
-        self.left = left
-        self.right = right
+    def expression(self, index):
+        antecedent = self.antecedent.expression(index)
+        consequent = self.consequent.expression(index)
+        return f"(not {antecedent} or {consequent})"
 
-    def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
 
-    def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+class Biconditional(Sentence):
+    __slots__ = ("left", "right")
+
+    def __new__(cls, left, right):
+        left = Sentence.share(left)
+        right = Sentence.share(right)
+        key = (cls, left, right)
+        self = _lookup(key)
+        if self is None:
+            self = object.__new__(cls)
+            self.left = left
+            self.right = right
+            self._symbols = None
+            _interned[key] = weakref.KeyedRef(self, _forget, key)
+        return self
+
+    def __reduce__(self):
+        return (Biconditional, (self.left, self.right))
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
@@ -217,47 +470,237 @@ class Biconditional(Sentence):
                     and not self.right.evaluate(model)))
 
     def formula(self):
-        left = Sentence.parenthesize(str(self.left))
-        right = Sentence.parenthesize(str(self.right))
+        left = Sentence.parenthesize(self.left.formula())
+        right = Sentence.parenthesize(self.right.formula())
         return f"{left} <=> {right}"
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
+    def children(self):
+        return (self.left, self.right)
 
+    def partial(self, model):
+        left = self.left.partial(model)
+        if left is None:
+            return None
+        right = self.right.partial(model)
+        if right is None:
+            return None
+        return left == right
 
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
+    def bits(self, columns, mask):
+        left = self.left.bits(columns, mask)
+        return mask ^ left ^ self.right.bits(columns, mask)
 
-    def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
+    def expression(self, index):
+        left = self.left.expression(index)
+        right = self.right.expression(index)
+        return f"((not {left}) == (not {right}))"
 
-        # If model has an assignment for each symbol
-        if not symbols:
 
-            # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-                return query.evaluate(model)
-            return True
-        else:
-
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
-
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
-
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
+def model_check(knowledge, query):
+    """Checks if knowledge base entails query."""
 
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
+    # Get all symbols in both knowledge and query
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
+
+    # Compile both sentences over the same ordering of symbols
+    knowledge_true = knowledge.compile(symbols)
+    query_true = query.compile(symbols)
+
+    # In every model where knowledge base is true, query must also be true
+    for model in itertools.product((True, False), repeat=len(symbols)):
+        if knowledge_true(model) and not query_true(model):
+            return False
+    return True
+
+
+def truth_columns(symbols):
+    """Returns the truth table of `symbols` as (columns, mask).
+
+    Model k assigns the i-th symbol the value of bit i of k, so column i
+    is blocks of 2^i false models followed by 2^i true models, repeated.
+    `mask` has one bit set for each of the 2^n models.
+    """
+    n = len(symbols)
+    models = 1 << n
+    mask = (1 << models) - 1
+    columns = dict()
+    for i, symbol in enumerate(symbols):
+        width = 1 << i
+        column = ((1 << width) - 1) << width
+        period = 2 * width
+
+        # Repeat the block, doubling its length until it covers every model
+        while period < models:
+            column |= column << period
+            period *= 2
+        columns[symbol] = column
+    return columns, mask
+
+
+def model_check_bitwise(knowledge, query, chunk=16, model=None):
+    """Checks if knowledge base entails query, evaluating both sentences
+    across many models at once with bitwise operations on truth tables.
+
+    The first `chunk` symbols are spread across the bits of a truth
+    table; the remaining symbols are enumerated, holding each one
+    constant (all models true or all false) within a table. Small
+    tables stay in cache, and a counter-model ends the check early.
+    Symbols assigned in `model` keep that value in every model checked.
+    """
+    model = model or dict()
 
     # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols())
+                     - set(model))
+    columns, mask = truth_columns(symbols[:chunk])
+    columns.update(
+        {symbol: mask if model[symbol] else 0 for symbol in model})
+    fixed = symbols[chunk:]
+
+    for values in itertools.product((mask, 0), repeat=len(fixed)):
+        columns.update(zip(fixed, values))
+
+        # No model may make knowledge base true and query false
+        models = knowledge.bits(columns, mask)
+        if models and models & (mask ^ query.bits(columns, mask)):
+            return False
+    return True
+
+
+def model_check_all(knowledge, queries, chunk=16):
+    """Checks which of `queries` the knowledge base entails.
+
+    Models of the knowledge base are enumerated once, as bitwise truth
+    tables (see `model_check_bitwise`), and every query still entailed
+    is checked against them. Returns a dict mapping each query to
+    whether knowledge base entails it.
+    """
+    queries = list(queries)
+    symbols = sorted(set.union(knowledge.symbols(),
+                               *[query.symbols() for query in queries]))
+    columns, mask = truth_columns(symbols[:chunk])
+    fixed = symbols[chunk:]
+
+    results = {query: True for query in queries}
+    remaining = list(results)
+    for values in itertools.product((mask, 0), repeat=len(fixed)):
+        columns.update(zip(fixed, values))
+        models = knowledge.bits(columns, mask)
+        if not models:
+            continue
+
+        # A query stays entailed only while no model falsifies it
+        for query in remaining:
+            if models & (mask ^ query.bits(columns, mask)):
+                results[query] = False
+        remaining = [query for query in remaining if results[query]]
+        if not remaining:
+            break
+    return results
+
+
+def symbol_order(*sentences):
+    """Returns the symbols in `sentences`, most frequently occurring first,
+    so that assigning them early decides as much of the sentences as
+    possible."""
+    counts = dict()
+    stack = list(sentences)
+    while stack:
+        sentence = stack.pop()
+        if isinstance(sentence, Symbol):
+            counts[sentence.name] = counts.get(sentence.name, 0) + 1
+        else:
+            stack.extend(sentence.children())
+    return sorted(counts, key=lambda name: (-counts[name], name))
+
+
+def model_check_pruning(knowledge, query, stats=None):
+    """Checks if knowledge base entails query, assigning one symbol at a
+    time and evaluating both sentences in each partial model.
+
+    A branch is pruned as soon as knowledge base is false in it (no
+    model there can be a counter-model) or query is true in it, and a
+    counter-model is reported as soon as knowledge base is true and
+    query is false. Symbols are assigned in `symbol_order`. If `stats`
+    is a dict, the number of partial models visited is added to its
+    "nodes" entry.
+    """
+    order = symbol_order(knowledge, query)
+    model = dict()
+    nodes = 0
+
+    def check_all(i):
+        """Checks if knowledge base entails query in every extension of
+        the current partial model."""
+        nonlocal nodes
+        nodes += 1
+
+        # Knowledge base false or query true: no counter-model below
+        knowledge_value = knowledge.partial(model)
+        if knowledge_value is False:
+            return True
+        query_value = query.partial(model)
+        if query_value is True:
+            return True
 
-    # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+        # Knowledge base true and query false: every extension is one
+        if knowledge_value is True and query_value is False:
+            return False
+
+        p = order[i]
+        for value in (True, False):
+            model[p] = value
+            if not check_all(i + 1):
+                return False
+        del model[p]
+        return True
+
+    result = check_all(0)
+    if stats is not None:
+        stats["nodes"] = stats.get("nodes", 0) + nodes
+    return result
+
+
+# Sentences a model_check_parallel worker process checks
+_worker = dict()
+
+
+def _start_worker(knowledge, query, chunk):
+    _worker.update(knowledge=knowledge, query=query, chunk=chunk)
+
+
+def _check_subtree(model):
+    return model_check_bitwise(_worker["knowledge"], _worker["query"],
+                               _worker["chunk"], model)
+
+
+def model_check_parallel(knowledge, query, processes=None, split=None,
+                         chunk=16):
+    """Checks if knowledge base entails query, dividing the models among
+    a pool of `processes` worker processes (all cores by default).
+
+    The models are split into 2^`split` subtrees by fixing the values of
+    `split` symbols (by default enough for four subtrees per process),
+    and each subtree is checked with `model_check_bitwise`. As soon as
+    any worker finds a counter-model, the remaining work is cancelled.
+    """
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
+    processes = processes or os.cpu_count() or 1
+    if split is None:
+        split = (4 * processes - 1).bit_length()
+    split = min(split, len(symbols))
+
+    # Fix the symbols that would otherwise be enumerated last
+    prefix = symbols[len(symbols) - split:]
+    subtrees = [
+        dict(zip(prefix, values))
+        for values in itertools.product((True, False), repeat=split)
+    ]
+
+    # Leaving the pool early terminates every outstanding task
+    with multiprocessing.Pool(processes, initializer=_start_worker,
+                              initargs=(knowledge, query, chunk)) as pool:
+        for entailed in pool.imap_unordered(_check_subtree, subtrees):
+            if not entailed:
+                return False
+    return True
@@ -0,0 +1,416 @@
+import heapq
+
+from logic import *
+
+
+class CNF():
+    """
+    Clauses over integer variables, built from logical sentences.
+
+    Symbols become variables 1..n; every compound subsentence gets a
+    fresh variable defined by its Tseitin clauses, so the clause set
+    grows linearly with the size of the sentence. A clause is a list of
+    non-zero integers, negative for negated variables (as in DIMACS).
+    """
+
+    def __init__(self):
+        self.variables = dict()
+        self.clauses = []
+        self.count = 0
+        self.literals = dict()
+
+    def variable(self, name=None):
+        """Returns the variable for symbol `name`, or a fresh variable."""
+        if name is not None and name in self.variables:
+            return self.variables[name]
+        self.count += 1
+        if name is not None:
+            self.variables[name] = self.count
+        return self.count
+
+    def literal(self, sentence):
+        """Returns a literal that is true exactly when `sentence` is."""
+        if isinstance(sentence, Symbol):
+            return self.variable(sentence.name)
+        if isinstance(sentence, Not):
+            return -self.literal(sentence.operand)
+        if sentence in self.literals:
+            return self.literals[sentence]
+
+        if isinstance(sentence, And):
+            operands = [self.literal(c) for c in sentence.conjuncts]
+            v = self.variable()
+            for operand in operands:
+                self.clauses.append([-v, operand])
+            self.clauses.append([v] + [-operand for operand in operands])
+        elif isinstance(sentence, Or):
+            operands = [self.literal(d) for d in sentence.disjuncts]
+            v = self.variable()
+            for operand in operands:
+                self.clauses.append([v, -operand])
+            self.clauses.append([-v] + operands)
+        elif isinstance(sentence, Implication):
+            a = self.literal(sentence.antecedent)
+            b = self.literal(sentence.consequent)
+            v = self.variable()
+            self.clauses.extend([[-v, -a, b], [v, a], [v, -b]])
+        elif isinstance(sentence, Biconditional):
+            a = self.literal(sentence.left)
+            b = self.literal(sentence.right)
+            v = self.variable()
+            self.clauses.extend([[-v, -a, b], [-v, a, -b],
+                                 [v, a, b], [v, -a, -b]])
+        else:
+            raise TypeError("must be a logical sentence")
+
+        self.literals[sentence] = v
+        return v
+
+    def add(self, sentence):
+        """Adds clauses asserting that `sentence` is true."""
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        elif isinstance(sentence, Or):
+            self.clauses.append(
+                [self.literal(disjunct) for disjunct in sentence.disjuncts])
+        elif isinstance(sentence, Implication):
+            self.clauses.append([-self.literal(sentence.antecedent),
+                                 self.literal(sentence.consequent)])
+        else:
+            self.clauses.append([self.literal(sentence)])
+
+
+class Solver():
+    """
+    Conflict-driven clause learning SAT solver.
+
+    Unit propagation uses two watched literals per clause; conflicts are
+    analyzed to the first unique implication point, the learned clause
+    is kept and the search backjumps to its asserting level. Decisions
+    follow variable activity (VSIDS) with saved phases, and the search
+    restarts on a Luby schedule.
+    """
+
+    def __init__(self, clauses=(), variables=0):
+        self.clauses = []
+        self.watches = dict()
+        self.value = [None]
+        self.level = [0]
+        self.reason = [None]
+        self.activity = [0.0]
+        self.phase = [False]
+        self.variables = 0
+        self.trail = []
+        self.trail_lim = []
+        self.head = 0
+        self.heap = []
+        self.increment = 1.0
+        self.unsat = False
+        self.model = None
+        self.conflicts = 0
+        self.decisions = 0
+        self.propagations = 0
+        self.reserve(variables)
+        for clause in clauses:
+            self.add_clause(clause)
+
+    def reserve(self, variables):
+        """Makes room for variables 1..`variables`."""
+        while self.variables < variables:
+            self.variables += 1
+            v = self.variables
+            self.value.append(None)
+            self.level.append(0)
+            self.reason.append(None)
+            self.activity.append(0.0)
+            self.phase.append(False)
+            self.watches[v] = []
+            self.watches[-v] = []
+            heapq.heappush(self.heap, (0.0, v))
+
+    def literal_value(self, literal):
+        value = self.value[abs(literal)]
+        if value is None or literal > 0:
+            return value
+        return not value
+
+    def add_clause(self, clause):
+        """Adds a clause; must be called between searches."""
+        if self.unsat:
+            return
+        clause = list(dict.fromkeys(clause))
+        if any(-literal in clause for literal in clause):
+            return
+        self.reserve(max((abs(literal) for literal in clause), default=0))
+
+        # Drop literals already false at level 0; skip satisfied clauses
+        literals = []
+        for literal in clause:
+            value = self.literal_value(literal)
+            if value is True:
+                return
+            if value is None:
+                literals.append(literal)
+
+        if not literals:
+            self.unsat = True
+        elif len(literals) == 1:
+            self.assign(literals[0], None)
+            if self.propagate() is not None:
+                self.unsat = True
+        else:
+            self.attach(literals)
+
+    def attach(self, clause):
+        index = len(self.clauses)
+        self.clauses.append(clause)
+        self.watches[clause[0]].append(index)
+        self.watches[clause[1]].append(index)
+        return index
+
+    def assign(self, literal, reason):
+        v = abs(literal)
+        self.value[v] = literal > 0
+        self.level[v] = len(self.trail_lim)
+        self.reason[v] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """Propagates unit clauses; returns a conflicting clause or None."""
+        clauses = self.clauses
+        value = self.value
+        while self.head < len(self.trail):
+            false_literal = -self.trail[self.head]
+            self.head += 1
+            self.propagations += 1
+            watchers = self.watches[false_literal]
+            self.watches[false_literal] = kept = []
+            for position, index in enumerate(watchers):
+                clause = clauses[index]
+
+                # Keep the false literal in the second watch position
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], clause[0]
+                first = clause[0]
+                first_value = value[abs(first)]
+                if first_value is not None and first_value == (first > 0):
+                    kept.append(index)
+                    continue
+
+                # Look for a replacement watch that is not false
+                for k in range(2, len(clause)):
+                    candidate = clause[k]
+                    candidate_value = value[abs(candidate)]
+                    if (candidate_value is None
+                            or candidate_value == (candidate > 0)):
+                        clause[1], clause[k] = candidate, false_literal
+                        self.watches[candidate].append(index)
+                        break
+                else:
+                    kept.append(index)
+                    if first_value is not None:
+                        kept.extend(watchers[position + 1:])
+                        return index
+                    self.assign(first, index)
+        return None
+
+    def analyze(self, conflict):
+        """Returns the first-UIP learned clause and its backjump level."""
+        learned = [None]
+        seen = set()
+        counter = 0
+        literal = None
+        index = len(self.trail) - 1
+        current = len(self.trail_lim)
+        clause = self.clauses[conflict]
+        while True:
+            for q in clause:
+                v = abs(q)
+                if q == literal or v in seen or self.level[v] == 0:
+                    continue
+                seen.add(v)
+                self.bump(v)
+                if self.level[v] == current:
+                    counter += 1
+                else:
+                    learned.append(q)
+
+            # Walk back to the most recent literal involved in the conflict
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            counter -= 1
+            if counter == 0:
+                break
+            clause = self.clauses[self.reason[abs(literal)]]
+        learned[0] = -literal
+
+        if len(learned) == 1:
+            return learned, 0
+        deepest = max(range(1, len(learned)),
+                      key=lambda i: self.level[abs(learned[i])])
+        learned[1], learned[deepest] = learned[deepest], learned[1]
+        return learned, self.level[abs(learned[1])]
+
+    def bump(self, v):
+        self.activity[v] += self.increment
+        if self.activity[v] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.increment *= 1e-100
+            self.heap = [(-self.activity[u], u)
+                         for u in range(1, self.variables + 1)
+                         if self.value[u] is None]
+            heapq.heapify(self.heap)
+        elif self.value[v] is None:
+            heapq.heappush(self.heap, (-self.activity[v], v))
+
+    def backtrack(self, level):
+        if len(self.trail_lim) <= level:
+            return
+        start = self.trail_lim[level]
+        for literal in self.trail[start:]:
+            v = abs(literal)
+            self.phase[v] = literal > 0
+            self.value[v] = None
+            self.reason[v] = None
+            heapq.heappush(self.heap, (-self.activity[v], v))
+        del self.trail[start:]
+        del self.trail_lim[level:]
+        self.head = len(self.trail)
+
+    def decide(self):
+        """Returns the unassigned variable with the highest activity."""
+        while self.heap:
+            activity, v = heapq.heappop(self.heap)
+            if self.value[v] is None and -activity == self.activity[v]:
+                return v
+        for v in range(1, self.variables + 1):
+            if self.value[v] is None:
+                return v
+        return None
+
+    def solve(self, assumptions=()):
+        """
+        Returns True if the clauses are satisfiable with every literal in
+        `assumptions` true, storing a satisfying model in `self.model`
+        (a dict from variable to truth value), and False otherwise.
+        """
+        self.model = None
+        if self.unsat:
+            return False
+        for literal in assumptions:
+            self.reserve(abs(literal))
+        if self.propagate() is not None:
+            self.unsat = True
+            return False
+
+        restart = 1
+        budget = 100 * luby(restart)
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                budget -= 1
+                if not self.trail_lim:
+                    self.unsat = True
+                    return False
+                learned, level = self.analyze(conflict)
+                self.backtrack(level)
+                if len(learned) == 1:
+                    self.assign(learned[0], None)
+                else:
+                    self.assign(learned[0], self.attach(learned))
+                self.increment /= 0.95
+                continue
+
+            if budget <= 0:
+                restart += 1
+                budget = 100 * luby(restart)
+                self.backtrack(0)
+                continue
+
+            # Assumptions are decided first, one per decision level
+            literal = None
+            while len(self.trail_lim) < len(assumptions):
+                assumption = assumptions[len(self.trail_lim)]
+                value = self.literal_value(assumption)
+                if value is False:
+                    self.backtrack(0)
+                    return False
+                self.trail_lim.append(len(self.trail))
+                if value is None:
+                    literal = assumption
+                    break
+            if literal is None:
+                v = self.decide()
+                if v is None:
+                    self.model = {
+                        u: self.value[u] for u in range(1, self.variables + 1)
+                    }
+                    self.backtrack(0)
+                    return True
+                literal = v if self.phase[v] else -v
+                self.trail_lim.append(len(self.trail))
+            self.decisions += 1
+            self.assign(literal, None)
+
+
+def luby(i):
+    """Returns the i-th term (from 1) of the Luby restart sequence."""
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    while i != (1 << k) - 1:
+        i -= (1 << (k - 1)) - 1
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+    return 1 << (k - 1)
+
+
+def satisfiable(sentence):
+    """Returns a model of `sentence` as a dict from symbol names to truth
+    values, or None if the sentence is unsatisfiable."""
+    cnf = CNF()
+    cnf.add(sentence)
+    for name in sentence.symbols():
+        cnf.variable(name)
+    solver = Solver(cnf.clauses, cnf.count)
+    if not solver.solve():
+        return None
+    return {name: solver.model[v] for name, v in cnf.variables.items()}
+
+
+def entails(knowledge, query):
+    """Checks if knowledge base entails query, by showing that knowledge
+    base and the negation of query together are unsatisfiable."""
+    cnf = CNF()
+    cnf.add(knowledge)
+    negated = -cnf.literal(query)
+    solver = Solver(cnf.clauses, cnf.count)
+    return not solver.solve([negated])
+
+
+def entails_all(knowledge, queries):
+    """Checks which of `queries` the knowledge base entails, reusing one
+    solver (and the clauses it learns) for every query. Returns a dict
+    mapping each query to whether knowledge base entails it."""
+    cnf = CNF()
+    cnf.add(knowledge)
+    literals = {query: cnf.literal(query) for query in queries}
+    solver = Solver(cnf.clauses, cnf.count)
+    results = dict()
+    for query, literal in literals.items():
+        if query in results:
+            continue
+        results[query] = not solver.solve([-literal])
+
+        # A model of knowledge base refutes every query false in it
+        if solver.model is not None:
+            for other, other_literal in literals.items():
+                value = solver.model[abs(other_literal)]
+                if (other_literal < 0) == value:
+                    results[other] = False
+    return results
@@ -0,0 +1,143 @@
+import argparse
+import multiprocessing
+import os
+import random
+import time
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play seeded games of MinesweeperAI without a display.")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--size", type=int, nargs=2, default=[8, 8],
+                        metavar=("HEIGHT", "WIDTH"))
+    mines = parser.add_mutually_exclusive_group()
+    mines.add_argument("--mines", type=int, default=None)
+    mines.add_argument("--density", type=float, default=None,
+                       help="fraction of cells that are mines")
+    parser.add_argument("--inference", choices=["subset", "matrix"],
+                        default="subset")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="game i is played with seed SEED + i")
+    parser.add_argument("--memory", action="store_true",
+                        help="also report the largest knowledge base, "
+                        "from MinesweeperAI.memory_stats after every move")
+    args = parser.parse_args()
+
+    if args.games < 1:
+        parser.error("--games must be at least 1")
+    if args.processes is not None and args.processes < 1:
+        parser.error("--processes must be at least 1")
+    height, width = args.size
+    if height < 1 or width < 1:
+        parser.error("--size must be at least 1 x 1")
+    if args.mines is not None:
+        count = args.mines
+    elif args.density is not None:
+        count = round(args.density * height * width)
+    else:
+        count = 8
+    if not 0 <= count < height * width:
+        parser.error(f"cannot place {count} mines on {height}x{width}")
+    simulate(args.games, height, width, count, args.inference,
+             args.processes, args.seed, args.memory)
+
+
+def play(task):
+    """
+    Plays one game of MinesweeperAI, seeded with `seed`, and returns
+    whether it was won, the number of cells revealed, the seconds taken
+    by each call to `add_knowledge` and, if `memory`, the largest number
+    of sentences and of bytes in the knowledge and index during the game
+    (otherwise None).
+    """
+    height, width, mines, inference, seed, memory = task
+    random.seed(seed)
+    game = Minesweeper(height=height, width=width, mines=mines)
+    ai = MinesweeperAI(height=height, width=width, mines=mines,
+                       inference=inference)
+    times = []
+    peak = (0, 0) if memory else None
+    won = True
+    while len(ai.moves_made) < height * width - mines:
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+            if move is None:
+                break
+        if game.is_mine(move):
+            won = False
+            break
+        start = time.perf_counter()
+        ai.add_knowledge(move, game.nearby_mines(move))
+        times.append(time.perf_counter() - start)
+        if memory:
+            stats = ai.memory_stats()
+            peak = (max(peak[0], stats["sentences"]),
+                    max(peak[1],
+                        stats["knowledge_bytes"] + stats["index_bytes"]))
+    return won, len(times), times, peak
+
+
+def percentile(values, p):
+    """
+    Returns the `p`-th percentile of the sorted list `values`, by the
+    nearest rank.
+    """
+    if not values:
+        return 0.0
+    rank = max(1, -(-len(values) * p // 100))
+    return values[rank - 1]
+
+
+def simulate(games, height, width, mines, inference, processes, seed,
+             memory=False):
+    """
+    Plays `games` seeded games on a pool of `processes` worker processes
+    and prints the win rate, the moves played per second and the time
+    per `add_knowledge` call (and, if `memory`, the largest knowledge
+    base of any game).
+    """
+    processes = processes or os.cpu_count() or 1
+    tasks = [(height, width, mines, inference, seed + i, memory)
+             for i in range(games)]
+    chunksize = max(1, games // (processes * 4))
+    wins = 0
+    moves = 0
+    times = []
+    sentences = 0
+    size = 0
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        for won, count, game_times, peak in pool.imap_unordered(
+                play, tasks, chunksize):
+            wins += won
+            moves += count
+            times.extend(game_times)
+            if peak is not None:
+                sentences = max(sentences, peak[0])
+                size = max(size, peak[1])
+    seconds = time.perf_counter() - start
+    times.sort()
+
+    print(f"{games} games on {height}x{width} with {mines} mines, "
+          f"{inference} inference, {processes} processes")
+    print(f"won {wins} ({100 * wins / games:.1f}%) in {seconds:.2f}s, "
+          f"{games / seconds:.1f} games/s")
+    print(f"{moves} moves, {moves / seconds:.0f} moves/s")
+    if times:
+        print(f"add_knowledge: mean {1e3 * sum(times) / len(times):.3f}ms, "
+              + ", ".join(f"p{p} {1e3 * percentile(times, p):.3f}ms"
+                          for p in (50, 90, 99))
+              + f", max {1e3 * times[-1]:.3f}ms")
+    if memory:
+        print(f"knowledge: at most {sentences} sentences, "
+              f"{size / 1024:.1f} KiB with the index")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,14 @@
+import collections
+import collections.abc
+import functools
 import itertools
+import math
 import random
-import copy
+import sys
+
+# Most steps spent counting the arrangements of mines in one group of
+# linked cells before their probabilities are estimated instead
+SEARCH_LIMIT = 100000
 
 
 class Minesweeper():
@@ -15,25 +23,38 @@ class Minesweeper():
         self.width = width
         self.mines = set()
 
-        # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
+        # Initialize an empty field with no mines: one byte per cell,
+        # numbered row by row
+        self.field = bytearray(height * width)
 
         # Add mines randomly
         while len(self.mines) != mines:
             i = random.randrange(height)
             j = random.randrange(width)
-            if not self.board[i][j]:
+            if not self.field[i * width + j]:
                 self.mines.add((i, j))
-                self.board[i][j] = True
+                self.field[i * width + j] = 1
+
+        # Count the mines next to every cell once
+        self.counts = bytearray(height * width)
+        table = neighbors(height, width)
+        for i, j in self.mines:
+            for n in table[i * width + j]:
+                self.counts[n] += 1
 
         # At first, player has found no mines
         self.mines_found = set()
 
+    @property
+    def board(self):
+        """
+        The field as a list of rows of booleans, True for mines.
+        """
+        return [
+            [bool(self.field[i * self.width + j]) for j in range(self.width)]
+            for i in range(self.height)
+        ]
+
     def print(self):
         """
         Prints a text-based representation
@@ -42,7 +63,7 @@ class Minesweeper():
         for i in range(self.height):
             print("--" * self.width + "-")
             for j in range(self.width):
-                if self.board[i][j]:
+                if self.field[i * self.width + j]:
                     print("|X", end="")
                 else:
                     print("| ", end="")
@@ -51,7 +72,7 @@ class Minesweeper():
 
     def is_mine(self, cell):
         i, j = cell
-        return self.board[i][j]
+        return bool(self.field[i * self.width + j])
 
     def nearby_mines(self, cell):
         """
@@ -59,24 +80,8 @@ class Minesweeper():
         within one row and column of a given cell,
         not including the cell itself.
         """
-
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
-
-        return count
+        i, j = cell
+        return self.counts[i * self.width + j]
 
     def won(self):
         """
@@ -148,44 +153,207 @@ class Sentence():
             self.cells.remove(cell)
 
 
+class CellSet(collections.abc.MutableSet):
+    """
+    Set of (i, j) cells of a board, kept as one byte per cell: `flags[n]`
+    is 1 if the cell numbered n (row by row) is in the set. Its memory
+    does not grow as cells are added, unlike a set of tuples.
+    """
+
+    def __init__(self, height, width, cells=()):
+        self.width = width
+        self.flags = bytearray(height * width)
+        self.size = 0
+        for cell in cells:
+            self.add(cell)
+
+    @classmethod
+    def _from_iterable(cls, cells):
+        # Results of set operations, such as mines - safes, are sets
+        return set(cells)
+
+    def __contains__(self, cell):
+        try:
+            i, j = cell
+        except (TypeError, ValueError):
+            return False
+        n = i * self.width + j
+        return 0 <= j < self.width and 0 <= n < len(self.flags) and bool(
+            self.flags[n])
+
+    def __iter__(self):
+        n = self.flags.find(1)
+        while n != -1:
+            yield divmod(n, self.width)
+            n = self.flags.find(1, n + 1)
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return f"CellSet({set(self)})"
+
+    def add(self, cell):
+        n = cell[0] * self.width + cell[1]
+        if not self.flags[n]:
+            self.flags[n] = 1
+            self.size += 1
+
+    def discard(self, cell):
+        if cell in self:
+            self.flags[cell[0] * self.width + cell[1]] = 0
+            self.size -= 1
+
+    def copy(self):
+        return set(self)
+
+
 class MinesweeperAI():
     """
     Minesweeper game player
+
+    Internally, cells are numbered row by row from 0, and a non-empty
+    set of cells is a pair (first, mask) of its lowest cell number and an
+    integer with bit k set if cell first + k is in the set (see
+    `cell_set`). Sentences only span a few rows, so the masks stay small
+    however large the board.
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=None, inference="subset"):
 
         # Set initial height and width
         self.height = height
         self.width = width
+        self.neighbors = neighbors(height, width)
+
+        # Total number of mines on the board, if known
+        self.total_mines = mines
+
+        # "subset" compares pairs of sentences; "matrix" also combines
+        # them by Gaussian elimination
+        if inference not in ("subset", "matrix"):
+            raise ValueError(f"unknown inference mode {inference}")
+        self.inference = inference
 
         # Keep track of which cells have been clicked on
-        self.moves_made = set()
+        self.moves_made = CellSet(height, width)
 
         # Keep track of cells known to be safe or mines
-        self.mines = set()
-        self.safes = set()
+        self.mines = CellSet(height, width)
+        self.safes = CellSet(height, width)
+
+        # Safe cells that have not been clicked on yet
+        self.safe_moves = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Sentences about the game known to be true, as a dict from the
+        # set of cells to the count of mines among them. No set is empty
+        # or has a cell known to be safe or a mine: cells are taken out
+        # as they become known, and emptied sentences dropped, so the
+        # knowledge only covers the cells next to revealed ones
+        self.knowledge = dict()
+
+        # For each cell number, the sets of cells of the sentences that
+        # mention it
+        self.index = dict()
+
+        # Cells of the sentences added or changed since the last inference
+        self.agenda = []
 
     def mark_mine(self, cell):
         """
         Marks a cell as a mine, and updates all knowledge
         to mark that cell as a mine as well.
         """
-        self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        self.resolve(cell[0] * self.width + cell[1], 1)
 
     def mark_safe(self, cell):
         """
         Marks a cell as safe, and updates all knowledge
         to mark that cell as safe as well.
         """
-        self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        self.resolve(cell[0] * self.width + cell[1], 0)
+
+    def resolve(self, n, mine):
+        """
+        Records that cell number `n` is a mine (if `mine` is 1) or safe
+        (if 0), and takes it out of the sentences that mention it.
+        """
+        cell = divmod(n, self.width)
+        if mine:
+            self.mines.add(cell)
+        else:
+            self.safes.add(cell)
+            if not self.moves_made.flags[n]:
+                self.safe_moves.add(cell)
+        for key in self.index.pop(n, ()):
+            count = self.remove_sentence(key)
+            self.add_sentence(difference(key, (n, 1)), count - mine)
+
+    def add_sentence(self, cells, count):
+        """
+        Adds a sentence about the set of cells `cells` to the knowledge
+        base, unless it is empty (None) or a sentence about the same cells
+        is already known, and puts it on the agenda for inference.
+        """
+        if cells is None or cells in self.knowledge:
+            return
+        self.knowledge[cells] = count
+        for n in bits(cells):
+            self.index.setdefault(n, set()).add(cells)
+        self.agenda.append(cells)
+
+    def remove_sentence(self, cells):
+        """
+        Removes the sentence about the set of cells `cells` from the
+        knowledge base and returns its count.
+        """
+        count = self.knowledge.pop(cells)
+        for n in bits(cells):
+            keys = self.index.get(n)
+            if keys is not None:
+                keys.discard(cells)
+                if not keys:
+                    del self.index[n]
+        return count
+
+    def sentences(self):
+        """
+        Returns the knowledge base as a list of Sentences.
+        """
+        return [
+            Sentence([divmod(n, self.width) for n in bits(cells)], count)
+            for cells, count in self.knowledge.items()
+        ]
+
+    def memory_stats(self):
+        """
+        Returns a dict of the number of sentences, of cells in the index
+        and of entries in it, of sentences on the agenda, and of known
+        mines and safe cells, with the approximate bytes used by the
+        knowledge, the index and the sets of cells.
+        """
+        knowledge_bytes = sys.getsizeof(self.knowledge) + sum(
+            sys.getsizeof(key) + sys.getsizeof(key[1])
+            for key in self.knowledge
+        )
+        index_bytes = sys.getsizeof(self.index) + sum(
+            sys.getsizeof(keys) for keys in self.index.values()
+        )
+        cell_bytes = sys.getsizeof(self.safe_moves) + sum(
+            sys.getsizeof(cells.flags)
+            for cells in (self.mines, self.safes, self.moves_made)
+        )
+        return {
+            "sentences": len(self.knowledge),
+            "indexed_cells": len(self.index),
+            "index_entries": sum(len(keys) for keys in self.index.values()),
+            "agenda": len(self.agenda),
+            "mines": len(self.mines),
+            "safes": len(self.safes),
+            "knowledge_bytes": knowledge_bytes,
+            "index_bytes": index_bytes,
+            "cell_bytes": cell_bytes,
+        }
 
     def add_knowledge(self, cell, count):
         """
@@ -205,26 +373,24 @@ class MinesweeperAI():
 
         # 1
         self.moves_made.add(cell)
+        self.safe_moves.discard(cell)
         # 2
-        self.mark_safe(cell)
-        # 3
-        cells = set()
-        neighbor_cells = self.neighbor_cell(cell)
-        count_cpy = count
-        for n_cell in neighbor_cells:
-            if n_cell in self.moves_made:
-                if n_cell in self.mines:
-                    count_cpy -= 1
-            else:
-                cells.add(n_cell)
-
-        new_sentence = Sentence(cells, count_cpy)
-        # Add new sentence
-        self.knowledge.append(new_sentence)
-        # 4
-        self.update_knowledge()
-        # 5
-        self.conclude_from_knowledge()
+        n = cell[0] * self.width + cell[1]
+        self.resolve(n, 0)
+        # 3, leaving out neighbors already known to be safe or mines
+        cells = []
+        mines, safes = self.mines.flags, self.safes.flags
+        for neighbor in self.neighbors[n]:
+            if mines[neighbor]:
+                count -= 1
+            elif not safes[neighbor]:
+                cells.append(neighbor)
+        self.add_sentence(cell_set(cells), count)
+        # 4 and 5
+        self.infer()
+        if self.inference == "matrix":
+            while self.eliminate():
+                self.infer()
 
     def make_safe_move(self):
         """
@@ -235,10 +401,8 @@ class MinesweeperAI():
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
         """
-        for cell in self.safes:
-            # check if cell has not been used
-            if cell not in self.moves_made:
-                return cell
+        for cell in self.safe_moves:
+            return cell
         return None
 
     def make_random_move(self):
@@ -247,72 +411,472 @@ class MinesweeperAI():
         Should choose randomly among cells that:
             1) have not already been chosen, and
             2) are not known to be mines
+        Of those, the cell least likely to be a mine is chosen (the
+        first in row-major order if several are equally likely).
         """
-        for i in range(self.height):
-            for j in range(self.width):
-                cell = (i, j)
-                # check if cell has not been used and are not mine
-                if cell not in self.moves_made and cell not in self.mines:
-                    return cell
-        return None
+        probabilities = self.mine_probabilities()
+        if not probabilities:
+            return None
+        return min(probabilities, key=lambda cell: (probabilities[cell], cell))
+
+    def mine_probabilities(self):
+        """
+        Returns a dict mapping each cell that has not been chosen and is
+        not known to be a mine to the probability that it is a mine,
+        with every arrangement of mines consistent with the knowledge
+        (and with the total number of mines, if known) equally likely.
+
+        Cells mentioned by sentences are split into components that
+        share no sentence, and the arrangements of each component are
+        counted separately, by number of mines. The components are then
+        combined with the cells no sentence mentions, whose mines can be
+        arranged in any way.
+
+        A component with too many arrangements to count is estimated
+        instead: each of its cells gets the mean share of mines of the
+        sentences it is in, and the total number of mines is ignored.
+        """
+        unknown = [
+            n for n, (mine, safe)
+            in enumerate(zip(self.mines.flags, self.safes.flags))
+            if not mine and not safe
+        ]
+        probabilities = {cell: 0.0 for cell in self.safe_moves}
+        if not unknown:
+            return probabilities
+
+        solutions = []
+        chances = dict()
+        for cells, counts in map(self.component_solutions,
+                                 self.components()):
+            if counts is not None:
+                solutions.append((cells, counts))
+                continue
+            for n in cells:
+                shares = [
+                    self.knowledge[key] / bin(key[1]).count("1")
+                    for key in self.index[n]
+                ]
+                chances[n] = sum(shares) / len(shares)
+        frontier = set(chances).union(*[cells for cells, _ in solutions])
+        free = len([n for n in unknown if n not in frontier])
+        remaining = None
+        if self.total_mines is not None and not chances:
+            remaining = self.total_mines - len(self.mines)
+
+        # Ways to place k mines in the components, all together (first)
+        # and leaving out each component in turn
+        component_ways = [
+            {k: ways for k, (ways, _) in counts.items()}
+            for _, counts in solutions
+        ]
+        totals = {0: 1}
+        for ways in component_ways:
+            totals = convolve(totals, ways)
+        others = []
+        for c in range(len(solutions)):
+            ways = {0: 1}
+            for d in range(len(solutions)):
+                if d != c:
+                    ways = convolve(ways, component_ways[d])
+            others.append(ways)
+
+        def free_ways(k, cells=free):
+            """Ways to place the other mines among `cells` free cells,
+            for k mines in the components."""
+            if remaining is None:
+                return 1
+            if not 0 <= remaining - k <= cells:
+                return 0
+            return math.comb(cells, remaining - k)
+
+        weight = sum(ways * free_ways(k) for k, ways in totals.items())
+        if weight == 0:
+            raise ValueError("knowledge is inconsistent with the board")
+
+        for c, (cells, counts) in enumerate(solutions):
+            for k, (_, mines) in counts.items():
+
+                # Arrangements of everything else for each of this
+                # component's arrangements with k mines
+                rest = sum(ways * free_ways(k + j)
+                           for j, ways in others[c].items())
+                for n in cells:
+                    chances[n] = chances.get(n, 0) + mines.get(n, 0) * rest
+            for n in cells:
+                chances[n] /= weight
+
+        # Each free cell is a mine in the same share of arrangements;
+        # without a total, guess the density seen on the frontier
+        if free:
+            if remaining is None:
+                density = (sum(chances.values()) / len(frontier)
+                           if frontier else 0.5)
+            else:
+                density = sum(
+                    ways * free_ways(k) * (remaining - k)
+                    for k, ways in totals.items()
+                ) / (weight * free)
+            for n in unknown:
+                if n not in frontier:
+                    chances[n] = density
+
+        for n, chance in chances.items():
+            probabilities[divmod(n, self.width)] = chance
+        return probabilities
+
+    def components(self):
+        """
+        Returns the cells mentioned by sentences, split into lists of
+        cell numbers linked by sharing sentences.
+        """
+        parent = dict()
+
+        def find(n):
+            while parent[n] != n:
+                parent[n] = parent[parent[n]]
+                n = parent[n]
+            return n
+
+        for key in self.knowledge:
+            cells = bits(key)
+            first = next(cells)
+            parent.setdefault(first, first)
+            for n in cells:
+                parent.setdefault(n, n)
+                parent[find(n)] = find(first)
+
+        groups = dict()
+        for n in parent:
+            groups.setdefault(find(n), []).append(n)
+        return list(groups.values())
+
+    def component_solutions(self, cells):
+        """
+        Counts the arrangements of mines in a component's cells that
+        satisfy every sentence mentioning them.
+
+        Cells in exactly the same sentences are interchangeable, so they
+        are grouped, and the search backtracks over how many mines each
+        group holds: a group of m cells with c mines stands for
+        comb(m, c) arrangements. The search takes at most SEARCH_LIMIT
+        steps.
+
+        Returns (cells, counts), where counts maps each number of mines
+        k to (ways, mines): how many arrangements have k mines, and in
+        how many of those each cell is a mine. counts is None if the
+        search ran out of steps.
+        """
+        keys = list(set().union(*[self.index[n] for n in cells]))
+        required = [self.knowledge[key] for key in keys]
+        member_of = dict()
+        for s, key in enumerate(keys):
+            for n in bits(key):
+                member_of.setdefault(n, []).append(s)
+
+        # Group the cells by the sentences they are in
+        groups = dict()
+        for n in cells:
+            groups.setdefault(tuple(member_of[n]), []).append(n)
+        sentences = list(groups)
+        sizes = [len(group) for group in groups.values()]
+        by_sentence = [[] for _ in keys]
+        for g, in_sentences in enumerate(sentences):
+            for s in in_sentences:
+                by_sentence[s].append(g)
+
+        # Visit groups breadth first, so sentences are completed early
+        order = []
+        seen = {0}
+        queue = collections.deque([0])
+        while queue:
+            g = queue.popleft()
+            order.append(g)
+            for s in sentences[g]:
+                for other in by_sentence[s]:
+                    if other not in seen:
+                        seen.add(other)
+                        queue.append(other)
+
+        # Mines placed in each sentence, and cells not yet assigned
+        placed = [0] * len(keys)
+        unassigned = [0] * len(keys)
+        for g, in_sentences in enumerate(sentences):
+            for s in in_sentences:
+                unassigned[s] += sizes[g]
+
+        # Backtrack without recursion: depth i holds the mines chosen
+        # for group order[i] (-1 if none yet) and the most it may hold
+        chosen = [-1] * len(order)
+        highest = [0] * len(order)
+        counts = dict()
+        steps = 0
+        i = 0
+        while i >= 0:
+            if i == len(order):
+                ways = 1
+                total = 0
+                for d, g in enumerate(order):
+                    ways *= math.comb(sizes[g], chosen[d])
+                    total += chosen[d]
+                entry = counts.setdefault(total, [0, [0] * len(sizes)])
+                entry[0] += ways
+                for d, g in enumerate(order):
+                    entry[1][g] += ways * chosen[d] // sizes[g]
+                i -= 1
+                continue
+
+            steps += 1
+            if steps > SEARCH_LIMIT:
+                return cells, None
+            g = order[i]
+            size = sizes[g]
+            c = chosen[i]
+            if c < 0:
+
+                # First visit: take the group out of its sentences and
+                # find how many mines it can hold
+                low, high = 0, size
+                for s in sentences[g]:
+                    unassigned[s] -= size
+                    need = required[s] - placed[s]
+                    low = max(low, need - unassigned[s])
+                    high = min(high, need)
+                highest[i] = high
+                c = low
+            else:
+                for s in sentences[g]:
+                    placed[s] -= c
+                c += 1
+
+            if c > highest[i]:
+                for s in sentences[g]:
+                    unassigned[s] += size
+                chosen[i] = -1
+                i -= 1
+                continue
+            for s in sentences[g]:
+                placed[s] += c
+            chosen[i] = c
+            i += 1
+
+        groups = list(groups.values())
+        return cells, {
+            k: (ways, {
+                n: mines[g]
+                for g, group in enumerate(groups) if mines[g]
+                for n in group
+            })
+            for k, (ways, mines) in counts.items()
+        }
+
+    def eliminate(self):
+        """
+        Combines every sentence by Gaussian elimination, component by
+        component, and marks the cells that the reduced equations force
+        to be mines or safe. Returns True if any cell was marked.
+
+        Each cell is 0 or 1, so in a reduced equation the left side lies
+        between the sum of its negative coefficients and the sum of its
+        positive ones. If the right side equals one of those bounds, the
+        cells with positive coefficients are all mines and those with
+        negative coefficients all safe, or the other way around.
+        """
+        mines = set()
+        safes = set()
+        for cells in self.components():
+            keys = set().union(*[self.index[n] for n in cells])
+            rows = [
+                ({n: 1 for n in bits(key)}, self.knowledge[key])
+                for key in keys
+            ]
+            for coefficients, rhs in eliminate_rows(rows):
+                low = sum(a for a in coefficients.values() if a < 0)
+                high = sum(a for a in coefficients.values() if a > 0)
+                if rhs == high:
+                    positive, negative = mines, safes
+                elif rhs == low:
+                    positive, negative = safes, mines
+                else:
+                    continue
+                for n, a in coefficients.items():
+                    (positive if a > 0 else negative).add(n)
+
+        for n in mines:
+            self.resolve(n, 1)
+        for n in safes:
+            self.resolve(n, 0)
+        return bool(mines or safes)
 
     def neighbor_cell(self, cell):
-        cells = set()
-        for i in range(cell[0]-1, cell[0]+2):
-            for j in range(cell[1]-1, cell[1]+2):
-                if (i, j) == cell:
+        return {
+            divmod(n, self.width)
+            for n in self.neighbors[cell[0] * self.width + cell[1]]
+        }
+
+    def infer(self):
+        """
+        Draws conclusions from the sentences on the agenda until no
+        more can be drawn.
+
+        A sentence whose count is 0 marks its cells safe, and one whose
+        count equals its size marks them mines; marking a cell changes
+        only the sentences that mention it, which go back on the
+        agenda. Otherwise the sentence is compared with the sentences
+        sharing a cell with it: when one's cells are a subset of the
+        other's, the larger is replaced by the difference of the two.
+        """
+        knowledge = self.knowledge
+        while self.agenda:
+            key = self.agenda.pop()
+            count = knowledge.get(key)
+            if count is None:
+                continue
+
+            if count == 0 or count == bin(key[1]).count("1"):
+                mine = 1 if count else 0
+                for n in list(bits(key)):
+                    self.resolve(n, mine)
+                continue
+
+            # Sentences that share a cell with this one
+            others = set()
+            for n in bits(key):
+                others |= self.index[n]
+            others.discard(key)
+
+            for other in others:
+                if key not in knowledge:
+                    break
+                if other not in knowledge:
                     continue
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    cells.add((i, j))
-        return cells
-
-    def update_knowledge(self):
-        # copy knowledge
-        knowledge_cpy = self.knowledge
-
-        # update mines, safes from knowledge base
-        for sentence in knowledge_cpy:
-            mines = sentence.known_mines()
-            safes = sentence.known_safes()
-
-            if mines:
-                for mine in mines:
-                    self.mark_mine(mine)
-
-            if safes:
-                for safe in safes:
-                    self.mark_safe(safe)
-
-    def conclude_from_knowledge(self):
-        # sentence is not useful needed to be removed
-        need_delete = []
-
-        for i in range(0, len(self.knowledge)):
-            for j in range(0, i):
-                # copy first sentence
-                sentence_i = copy.deepcopy(self.knowledge[i])
-                # copy second sentence
-                sentence_j = copy.deepcopy(self.knowledge[j])
-                # second set always is greater than first set
-                if sentence_i.count > sentence_j.count:
-                    # swap
-                    sentence_i, sentence_j = sentence_j, sentence_i
-                # check first set is subset of second subset
-                if sentence_i.cells.issubset(sentence_j.cells):
-                    # new set
-                    new_cells = sentence_j.cells - sentence_i.cells
-                    # new count
-                    new_count = sentence_j.count - sentence_i.count
-                    # new sentence which is inferred from two sentences
-                    new_sentence = Sentence(new_cells, new_count)
-                    self.knowledge.append(new_sentence)
-                    # second sentence is not useful, so it is needed to removed
-                    need_delete.append(sentence_j)
-
-        # remove sentences from knowledge base
-        for no_need_sentence in need_delete:
-            if no_need_sentence in self.knowledge:
-                self.knowledge.remove(no_need_sentence)
-
-        # update knowledge
-        self.update_knowledge()
+                rest = difference(key, other)
+                if rest is None:
+                    subset, superset = key, other
+                    rest = difference(other, key)
+                elif difference(other, key) is None:
+                    subset, superset = other, key
+                else:
+                    continue
+                count = knowledge[superset] - knowledge[subset]
+                self.remove_sentence(superset)
+                self.add_sentence(rest, count)
+
+
+def eliminate_rows(rows):
+    """
+    Reduces a system of integer linear equations, each a pair of a dict
+    mapping columns to non-zero coefficients and a right-hand side, to
+    row echelon form by fraction-free Gaussian elimination, dividing
+    each row by the gcd of its entries to keep them small. Returns the
+    reduced rows, dropping any that become 0 = 0.
+    """
+    rows = [(dict(coefficients), rhs) for coefficients, rhs in rows]
+    reduced = []
+    while rows:
+        coefficients, rhs = rows.pop()
+        if not coefficients:
+            continue
+        column = min(coefficients)
+        pivot = coefficients[column]
+
+        # Clear the pivot column from every other row, reduced or not
+        for group in (rows, reduced):
+            for r, (other, other_rhs) in enumerate(group):
+                factor = other.get(column)
+                if factor is None:
+                    continue
+                combined = {
+                    c: (pivot * other.get(c, 0)
+                        - factor * coefficients.get(c, 0))
+                    for c in other.keys() | coefficients.keys()
+                }
+                combined = {c: a for c, a in combined.items() if a}
+                combined_rhs = pivot * other_rhs - factor * rhs
+                divisor = math.gcd(combined_rhs, *combined.values())
+                if divisor > 1:
+                    combined = {c: a // divisor
+                                for c, a in combined.items()}
+                    combined_rhs //= divisor
+                group[r] = (combined, combined_rhs)
+        reduced = [row for row in reduced if row[0]]
+        reduced.append((coefficients, rhs))
+    return reduced
+
+
+def convolve(a, b):
+    """
+    Returns the number of ways to place k mines in two independent sets
+    of cells, for each k, given the number of ways for each set.
+    """
+    ways = dict()
+    for i, x in a.items():
+        for j, y in b.items():
+            ways[i + j] = ways.get(i + j, 0) + x * y
+    return ways
+
+
+@functools.lru_cache(maxsize=None)
+def neighbors(height, width):
+    """
+    Returns, for each cell number of a board, a tuple of the numbers of
+    the cells within one row and column of it, not including itself.
+    """
+    # Share one int object per cell between the tuples
+    numbers = list(range(height * width))
+    table = []
+    for i in range(height):
+        for j in range(width):
+            table.append(tuple(
+                numbers[ni * width + nj]
+                for ni in range(max(i - 1, 0), min(i + 2, height))
+                for nj in range(max(j - 1, 0), min(j + 2, width))
+                if (ni, nj) != (i, j)
+            ))
+    return table
+
+
+def cell_set(numbers):
+    """
+    Returns the set of the cell numbers in the ascending list `numbers`,
+    as a pair (first, mask), or None if the list is empty.
+    """
+    if not numbers:
+        return None
+    first = numbers[0]
+    mask = 0
+    for n in numbers:
+        mask |= 1 << (n - first)
+    return (first, mask)
+
+
+def difference(cells, other):
+    """
+    Returns the set of cells in `cells` but not in `other`, or None if
+    there are none.
+    """
+    first, mask = cells
+    other_first, other_mask = other
+    if other_first >= first:
+        mask &= ~(other_mask << (other_first - first))
+    else:
+        mask &= ~(other_mask >> (first - other_first))
+    if not mask:
+        return None
+    skip = (mask & -mask).bit_length() - 1
+    return (first + skip, mask >> skip)
+
+
+def bits(cells):
+    """
+    Yields the numbers of the cells in the set of cells `cells`, lowest
+    first.
+    """
+    n, mask = cells
+    yield n
+    mask >>= 1
+    while mask:
+        skip = (mask & -mask).bit_length()
+        n += skip
+        yield n
+        mask >>= skip
@@ -0,0 +1,227 @@
+import argparse
+import random
+import time
+
+import mnk
+import tictactoe as ttt
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the tictactoe search engines.")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("tree", help="full game tree node throughput")
+    scaling = commands.add_parser(
+        "parallel", help="parallel root split against serial search on 4x4")
+    scaling.add_argument("--positions", type=int, default=5)
+    scaling.add_argument("--marks", type=int, default=6,
+                         help="marks already on each board")
+    scaling.add_argument("--processes", type=int, nargs="+",
+                         default=[1, 2, 4])
+    scaling.add_argument("--optimal", action="store_true",
+                         help="also time the list-based optimal()")
+    scaling.add_argument("--seed", type=int, default=0)
+    games = commands.add_parser(
+        "selfplay", help="games of minimax against itself, without pygame")
+    games.add_argument("--games", type=int, default=1000)
+    games.add_argument("--size", type=int, nargs=2, default=[3, 3],
+                       metavar=("ROWS", "COLUMNS"))
+    games.add_argument("--random", type=int, default=2,
+                       help="random moves opening each game")
+    games.add_argument("--k", type=int, default=None,
+                       help="marks in a row to win (default: 3 on 3x3, "
+                       "the shorter side up to 5x5, and 5 beyond)")
+    games.add_argument("--budget", type=float, default=mnk.BUDGET,
+                       help="seconds per move on boards other than 3x3")
+    games.add_argument("--no-book", action="store_true",
+                       help="search 3x3 positions instead of using the book")
+    games.add_argument("--fresh", action="store_true",
+                       help="clear the transposition table between games")
+    games.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "parallel":
+        parallel(args.positions, args.marks, args.processes, args.optimal,
+                 args.seed)
+    elif args.command == "selfplay":
+        if args.k is not None and not 1 < args.k <= max(args.size):
+            parser.error(f"--k must be from 2 to {max(args.size)}")
+        mnk.BUDGET = args.budget
+        if args.no_book:
+            ttt.BOOK = False
+        selfplay(args.games, args.size, args.random, args.fresh, args.seed,
+                 args.k)
+    else:
+        tree()
+
+
+def tree():
+    """
+    Prints the node throughput of a full game tree search on lists and
+    on bitboards.
+    """
+    board = ttt.initial_state()
+    searches = [
+        ("lists", lambda: list_tree(board)),
+        ("bitboard", lambda: bitboard_tree(ttt.Bitboard.from_board(board)))
+    ]
+    for name, search in searches:
+        start = time.perf_counter()
+        value, nodes = search()
+        seconds = time.perf_counter() - start
+        print(f"{name}: value {value}, {nodes} nodes in {seconds:.2f}s "
+              f"= {nodes / seconds:.0f} nodes/s")
+
+
+def positions(count, rows, columns, marks, rng):
+    """
+    Returns `count` random boards, not yet over, with `marks` marks.
+    """
+    boards = []
+    while len(boards) < count:
+        board = ttt.initial_state(rows, columns)
+        for _ in range(marks):
+            board = ttt.result(board, rng.choice(sorted(ttt.actions(board))))
+        if not ttt.terminal(board):
+            boards.append(board)
+    return boards
+
+
+def optimal_move(board):
+    """
+    Returns the first action with the best value, as found by
+    `tictactoe.optimal` searching each action in turn.
+    """
+    name_player = ttt.player(board)
+    best_action, best_utility = None, None
+    for action in sorted(ttt.actions(board)):
+        n_board = ttt.result(board, action)
+        if ttt.terminal(n_board):
+            utility = ttt.utility(n_board)
+        else:
+            utility = ttt.optimal(n_board, -2, 2)
+        if name_player == ttt.O:
+            utility = -utility
+        if best_utility is None or utility > best_utility:
+            best_action, best_utility = action, utility
+    return best_action
+
+
+def parallel(count, marks, processes, optimal, seed):
+    """
+    Prints the time `mnk.parallel_solve` takes on random 4 x 4 positions
+    with each number of `processes`, against serial `mnk.solve` (and the
+    list-based `tictactoe.optimal` if `optimal`), checking that the
+    parallel search returns the same move as the serial one.
+    """
+    boards = positions(count, 4, 4, marks, random.Random(seed))
+    searches = [("solve", mnk.solve)]
+    if optimal:
+        searches.insert(0, ("optimal", optimal_move))
+    searches.extend(
+        (f"parallel {p}", lambda board, p=p: mnk.parallel_solve(
+            board, processes=p))
+        for p in processes
+    )
+
+    totals = {name: 0 for name, _ in searches}
+    for i, board in enumerate(boards):
+        moves = dict()
+        for name, search in searches:
+            start = time.perf_counter()
+            moves[name] = search(board)
+            totals[name] += time.perf_counter() - start
+        agree = all(moves[name] == moves["solve"] for name in moves
+                    if name.startswith("parallel"))
+        print(f"position {i}: move {moves['solve']}, "
+              f"parallel {'agrees' if agree else 'DIFFERS'}")
+    for name, seconds in totals.items():
+        print(f"{name}: {seconds:.3f}s, "
+              f"{totals['solve'] / seconds:.2f}x serial solve")
+
+
+def selfplay(games, size, openings, fresh, seed, k=None):
+    """
+    Plays `games` games of `tictactoe.minimax` against itself on a board
+    of `size` where `k` marks in a row win (by default, as
+    `tictactoe.in_a_row`), each opened with `openings` random moves, and
+    prints the results with the search work done per move and per
+    second.
+    """
+    rng = random.Random(seed)
+    results = {ttt.X: 0, ttt.O: 0, None: 0}
+    stats = {"nodes": 0, "cutoffs": 0, "hits": 0, "seconds": 0}
+    moves = 0
+    depths = 0
+    start = time.perf_counter()
+    for _ in range(games):
+        if fresh:
+            ttt.TABLE.clear()
+        board = ttt.initial_state(*size)
+        for _ in range(openings):
+            if ttt.terminal(board, k):
+                break
+            board = ttt.result(board, rng.choice(sorted(ttt.actions(board))))
+        while not ttt.terminal(board, k):
+            move_stats = dict()
+            board = ttt.result(board, ttt.minimax(board, move_stats, k))
+            for name in stats:
+                stats[name] += move_stats[name]
+            depths += move_stats["depth"]
+            moves += 1
+        results[ttt.winner(board, k)] += 1
+    seconds = time.perf_counter() - start
+
+    print(f"{games} games in {seconds:.2f}s: X won {results[ttt.X]}, "
+          f"O won {results[ttt.O]}, {results[None]} drawn")
+    if moves == 0:
+        print("no searched moves: the random openings ended every game")
+        return
+    print(f"{moves} searched moves, {stats['seconds']:.2f}s searching, "
+          f"{moves / stats['seconds']:.0f} moves/s")
+    print(f"nodes: {stats['nodes']} "
+          f"({stats['nodes'] / stats['seconds']:.0f}/s, "
+          f"{stats['nodes'] / moves:.1f}/move)")
+    print(f"cutoffs: {stats['cutoffs']} ({stats['cutoffs'] / moves:.1f}/move)")
+    print(f"table hits: {stats['hits']} ({stats['hits'] / moves:.1f}/move)")
+    print(f"depth: {depths / moves:.1f} plies/move")
+
+
+def list_tree(board):
+    """
+    Returns the minimax value of the board and the number of nodes in
+    its full game tree, searched without pruning on list-of-lists boards.
+    """
+    if ttt.terminal(board):
+        return ttt.utility(board), 1
+    values = []
+    nodes = 1
+    for action in ttt.actions(board):
+        value, count = list_tree(ttt.result(board, action))
+        values.append(value)
+        nodes += count
+    return (max if ttt.player(board) == ttt.X else min)(values), nodes
+
+
+def bitboard_tree(bitboard):
+    """
+    Returns the minimax value of the bitboard and the number of nodes in
+    its full game tree, searched without pruning by playing and undoing
+    moves in place.
+    """
+    if bitboard.terminal():
+        return {ttt.X: 1, ttt.O: -1, None: 0}[bitboard.winner()], 1
+    values = []
+    nodes = 1
+    maximize = bitboard.player() == ttt.X
+    for cell in bitboard.actions():
+        bitboard.play(cell)
+        value, count = bitboard_tree(bitboard)
+        bitboard.undo(cell)
+        values.append(value)
+        nodes += count
+    return (max if maximize else min)(values), nodes
+
+
+if __name__ == "__main__":
+    main()
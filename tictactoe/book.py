@@ -0,0 +1,74 @@
+import array
+import os
+import sys
+import time
+
+import tictactoe as ttt
+
+
+def main():
+    start = time.perf_counter()
+    book = build()
+    seconds = time.perf_counter() - start
+    write(book, ttt.BOOK_FILE)
+    print(f"Solved {len(book)} positions in {seconds:.3f}s")
+    print(f"Wrote {os.path.getsize(ttt.BOOK_FILE)} bytes to {ttt.BOOK_FILE}")
+
+
+def build():
+    """
+    Solves every reachable position that is not over, up to symmetry,
+    and returns the sorted array of opening book entries (see
+    `tictactoe.book_entry` for their layout).
+    """
+    entries = dict()
+    stack = [(0, 0)]
+    while stack:
+        x, o = stack.pop()
+        key, s = ttt.canonical(x, o)
+        if key in entries:
+            continue
+
+        # Solve the canonical board, so its cells are the ones stored
+        t = ttt.TRANSFORMS[s]
+        x, o = t[x], t[o]
+        if bin(x).count("1") == bin(o).count("1"):
+            mover, other = x, o
+        else:
+            mover, other = o, x
+
+        best, value = None, -2
+        for cell in range(9):
+            if (x | o) >> cell & 1:
+                continue
+            moved = mover | 1 << cell
+            if any(moved & mask == mask for mask in ttt.CELL_WINS[cell]):
+                cell_value = 1
+            else:
+                cell_value = -ttt.search(other, moved, -2, 2)
+
+                # Positions after this move are in the book too
+                if (moved | other) != ttt.FULL:
+                    if mover == x:
+                        stack.append((moved, other))
+                    else:
+                        stack.append((other, moved))
+            if cell_value > value:
+                best, value = cell, cell_value
+        entries[key] = key << 8 | best << 2 | (value + 1)
+    return array.array("I", sorted(entries.values()))
+
+
+def write(book, filename):
+    """
+    Writes the opening book to a file, as little-endian 32-bit entries.
+    """
+    if sys.byteorder == "big":
+        book = array.array("I", book)
+        book.byteswap()
+    with open(filename, "wb") as f:
+        book.tofile(f)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+"""
+m,n,k-game engine: k marks in a row win on an m x n board.
+"""
+
+import math
+import multiprocessing
+import os
+import time
+
+from tictactoe import X, EMPTY, in_a_row, player, winner
+
+# Seconds to search for a move
+BUDGET = 1.0
+
+# Value of a win, less the number of marks on the board when it is won
+# (so the value depends only on the position, as the table needs)
+WIN = 1 << 60
+
+# Nodes searched between checks of the clock
+CHECK = 1024
+
+# Boards with more cells only consider moves next to a mark
+SMALL = 25
+
+# Directions of the lines of k cells: across, down and both diagonals
+DIRECTIONS = [(0, 1), (1, 0), (1, 1), (1, -1)]
+
+
+class Timeout(Exception):
+    pass
+
+
+class Game():
+    """
+    The lines of an m x n board. Cells are numbered row by row, and each
+    window (a line of k cells that could win) is kept as the list of
+    windows through each cell, so a move only touches its own windows.
+    """
+
+    def __init__(self, m, n, k):
+        self.m = m
+        self.n = n
+        self.k = k
+        self.size = m * n
+        self.windows = 0
+        self.cell_windows = [[] for _ in range(self.size)]
+        for i in range(m):
+            for j in range(n):
+                for di, dj in DIRECTIONS:
+                    end_i, end_j = i + (k - 1) * di, j + (k - 1) * dj
+                    if not (0 <= end_i < m and 0 <= end_j < n):
+                        continue
+                    for step in range(k):
+                        cell = (i + step * di) * n + (j + step * dj)
+                        self.cell_windows[cell].append(self.windows)
+                    self.windows += 1
+
+        # Cells next to each cell, where the search looks for moves
+        self.neighbours = []
+        for i in range(m):
+            for j in range(n):
+                mask = 0
+                for ni in range(max(i - 1, 0), min(i + 2, m)):
+                    for nj in range(max(j - 1, 0), min(j + 2, n)):
+                        mask |= 1 << (ni * n + nj)
+                self.neighbours.append(mask)
+
+        # Heuristic value, for X, of a window with x X marks and o O marks:
+        # only windows that one player can still complete count. Indexed
+        # by the marks of X then O, and of O then X
+        scores = [
+            [(10 ** x // 10 if o == 0 else -(10 ** o // 10) if x == 0 else 0)
+             for o in range(k + 1)]
+            for x in range(k + 1)
+        ]
+        self.scores = [scores, [list(column) for column in zip(*scores)]]
+
+
+class Search():
+    """
+    Iterative deepening alpha-beta search from one position of a Game.
+
+    The position is kept as bitboards for X and O, the number of each
+    player's marks in every window and the heuristic value for X, all
+    updated incrementally as moves are played and undone.
+    """
+
+    def __init__(self, game, board):
+        self.game = game
+        self.marks = [0, 0]
+        self.counts = [[0] * game.windows, [0] * game.windows]
+        self.score = 0
+        self.table = dict()
+        self.history = [0] * game.size
+        self.nodes = 0
+        self.cutoffs = 0
+        self.hits = 0
+        self.depth = 0
+        self.deadline = None
+        self.moves = 0
+        self.won = False
+        for i, row in enumerate(board):
+            for j, cell in enumerate(row):
+                if cell != EMPTY:
+                    self.place(i * game.n + j, 0 if cell == X else 1)
+        self.won = False
+        self.turn = 0 if player(board) == X else 1
+
+    def place(self, cell, side):
+        """
+        Marks `cell` for `side` (0 for X, 1 for O), updating the window
+        counts and the score, and noting if the move wins.
+        """
+        game = self.game
+        mine, theirs = self.counts[side], self.counts[1 - side]
+        scores = game.scores[side]
+        delta = 0
+        for w in game.cell_windows[cell]:
+            before = mine[w]
+            mine[w] = before + 1
+            if before + 1 == game.k:
+                self.won = True
+            delta += scores[before + 1][theirs[w]] - scores[before][theirs[w]]
+        self.score += delta
+        self.marks[side] |= 1 << cell
+        self.moves += 1
+
+    def remove(self, cell, side):
+        """
+        Takes back the mark of `side` on `cell`.
+        """
+        game = self.game
+        mine, theirs = self.counts[side], self.counts[1 - side]
+        scores = game.scores[side]
+        delta = 0
+        for w in game.cell_windows[cell]:
+            before = mine[w]
+            mine[w] = before - 1
+            delta += scores[before - 1][theirs[w]] - scores[before][theirs[w]]
+        self.score += delta
+        self.marks[side] &= ~(1 << cell)
+        self.moves -= 1
+        self.won = False
+
+    def candidates(self, best):
+        """
+        Returns the empty cells to search, the table's best move first
+        and the rest by how often they caused cutoffs, then by how many
+        windows pass through them. On boards larger
+        than SMALL, only cells next to a mark are searched (every cell
+        on an empty board).
+        """
+        game = self.game
+        occupied = self.marks[0] | self.marks[1]
+        empty = ((1 << game.size) - 1) & ~occupied
+        if occupied and game.size > SMALL:
+            near = 0
+            rest = occupied
+            while rest:
+                low = rest & -rest
+                near |= game.neighbours[low.bit_length() - 1]
+                rest ^= low
+            empty &= near
+        cells = []
+        while empty:
+            low = empty & -empty
+            cells.append(low.bit_length() - 1)
+            empty ^= low
+        history = self.history
+        windows = game.cell_windows
+        cells.sort(key=lambda cell: (-history[cell], -len(windows[cell])))
+        if best is not None and best in cells:
+            cells.remove(best)
+            cells.insert(0, best)
+        return cells
+
+    def negamax(self, depth, alpha, beta):
+        """
+        Returns the value of the position for the player to move,
+        searching `depth` more moves with alpha-beta pruning.
+        """
+        self.nodes += 1
+        if self.nodes % CHECK == 0 and time.perf_counter() > self.deadline:
+            raise Timeout
+        if self.moves == self.game.size:
+            return 0
+        side = self.turn
+        if depth == 0:
+            return self.score if side == 0 else -self.score
+
+        key = (self.marks[0], self.marks[1])
+        entry = self.table.get(key)
+        best = None
+        if entry is not None:
+            self.hits += 1
+            entry_depth, bound, value, best = entry
+            if entry_depth >= depth:
+                if bound == 0:
+                    return value
+                if bound > 0:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+        window = alpha
+
+        value = -WIN
+        for cell in self.candidates(best):
+            self.place(cell, side)
+            if self.won:
+                score = WIN - self.moves
+            else:
+                self.turn = 1 - side
+                score = -self.negamax(depth - 1, -beta, -alpha)
+                self.turn = side
+            self.remove(cell, side)
+            if score > value:
+                value = score
+                best = cell
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                self.history[cell] += depth * depth
+                self.cutoffs += 1
+                break
+
+        # Bound: -1 for an upper bound, 1 for a lower bound, 0 if exact
+        bound = -1 if value <= window else 1 if value >= beta else 0
+        self.table[key] = (depth, bound, value, best)
+        return value
+
+    def score_move(self, cell, depth, alpha):
+        """
+        Returns the value of playing `cell` for the player to move,
+        searching `depth` moves including this one. The value is exact
+        if it is above `alpha`, and otherwise at most `alpha`.
+        """
+        side = self.turn
+        self.place(cell, side)
+        if self.won:
+            score = WIN - self.moves
+        else:
+            self.turn = 1 - side
+            score = -self.negamax(depth - 1, -WIN, -alpha)
+            self.turn = side
+        self.remove(cell, side)
+        return score
+
+    def best_move(self, budget):
+        """
+        Returns the best cell to play found within `budget` seconds,
+        searching one move deeper at a time until the game tree is
+        searched to its end or the time runs out. The move comes from
+        the deepest search completed (or the first candidate if none
+        was); a search that ran out of time cannot be used again. On an
+        empty board, the middle cell is played without searching.
+        """
+        self.deadline = time.perf_counter() + budget
+
+        # Open in the middle, which the search is too shallow to see
+        if self.moves == 0:
+            return self.game.m // 2 * self.game.n + self.game.n // 2
+        moves = self.candidates(None)
+        best = moves[0]
+        remaining = self.game.size - self.moves
+        for depth in range(1, remaining + 1):
+            try:
+                alpha = -WIN
+                current = None
+                for cell in moves:
+                    score = self.score_move(cell, depth, alpha)
+                    if current is None or score > alpha:
+                        alpha = score
+                        current = cell
+            except Timeout:
+                break
+            best = current
+            self.depth = depth
+
+            # Search the best move first at the next depth
+            moves.remove(best)
+            moves.insert(0, best)
+            if abs(alpha) >= WIN - self.game.size:
+                break
+        return best
+
+
+def best_move(board, k=None, budget=BUDGET, counts=None):
+    """
+    Returns the best action (i, j) found within `budget` seconds for the
+    current player on an m x n board where `k` in a row wins (by
+    default, `in_a_row(board)`). Returns None if the board is full.
+
+    If `counts` is a dict, the nodes searched, cutoffs and table hits
+    are added to its "nodes", "cutoffs" and "hits" entries, and its
+    "depth" entry is raised to the deepest search completed.
+    """
+    m, n = len(board), len(board[0])
+    k = k or in_a_row(board)
+    if winner(board, k) is not None or all(
+            cell != EMPTY for row in board for cell in row):
+        return None
+    search = Search(Game(m, n, k), board)
+    cell = search.best_move(budget)
+    if counts is not None:
+        counts["nodes"] = counts.get("nodes", 0) + search.nodes
+        counts["cutoffs"] = counts.get("cutoffs", 0) + search.cutoffs
+        counts["hits"] = counts.get("hits", 0) + search.hits
+        counts["depth"] = max(counts.get("depth", 0), search.depth)
+    return (cell // n, cell % n)
+
+
+def solve(board, k=None):
+    """
+    Returns an optimal action (i, j) for the current player, searching
+    the whole game tree with no time limit: of the moves with the best
+    value, the first in the order the search tries them. Returns None
+    if the game is over.
+    """
+    k = k or in_a_row(board)
+    if winner(board, k) is not None or all(
+            cell != EMPTY for row in board for cell in row):
+        return None
+    search = Search(Game(len(board), len(board[0]), k), board)
+    search.deadline = math.inf
+    depth = search.game.size - search.moves
+
+    alpha = -WIN
+    best = None
+    for cell in search.candidates(None):
+        score = search.score_move(cell, depth, alpha)
+        if best is None or score > alpha:
+            alpha = score
+            best = cell
+    return (best // len(board[0]), best % len(board[0]))
+
+
+# Position and shared bound of a parallel_solve worker process
+_worker = dict()
+
+
+def _start_worker(board, k, best_score, best_index, lock):
+    _worker.update(board=board, k=k, best_score=best_score,
+                   best_index=best_index, lock=lock)
+
+
+def _score_root(task):
+    """
+    Scores the `index`-th root move in a worker, against the best move
+    found so far by any worker, and publishes it if it is better.
+    """
+    index, cell = task
+    board = _worker["board"]
+    search = Search(Game(len(board), len(board[0]), _worker["k"]), board)
+    search.deadline = math.inf
+    depth = search.game.size - search.moves
+
+    # Earlier moves win ties, so they must beat the best score minus one
+    best_score, best_index = _worker["best_score"], _worker["best_index"]
+    with _worker["lock"]:
+        alpha = best_score.value
+        if index < best_index.value:
+            alpha -= 1
+    score = search.score_move(cell, depth, alpha)
+    if score > alpha:
+        with _worker["lock"]:
+            if (score > best_score.value or score == best_score.value
+                    and index < best_index.value):
+                best_score.value = score
+                best_index.value = index
+    return search.nodes
+
+
+def parallel_solve(board, k=None, processes=None):
+    """
+    Returns the same action as `solve`, dividing the root moves among a
+    pool of `processes` worker processes (all cores by default).
+
+    The first root move is searched here, to set a bound, and the rest
+    are handed out one at a time (young brothers wait). Each worker
+    searches its move against the best value found so far, shared by
+    all workers, and moves that tie with an earlier one in the search
+    order are searched one point wider, so the first best move wins as
+    it does in `solve`.
+    """
+    k = k or in_a_row(board)
+    if winner(board, k) is not None or all(
+            cell != EMPTY for row in board for cell in row):
+        return None
+    search = Search(Game(len(board), len(board[0]), k), board)
+    search.deadline = math.inf
+    depth = search.game.size - search.moves
+    cells = search.candidates(None)
+
+    # Search the eldest brother before splitting
+    score = search.score_move(cells[0], depth, -WIN)
+    best_score = multiprocessing.Value("q", score, lock=False)
+    best_index = multiprocessing.Value("i", 0, lock=False)
+    lock = multiprocessing.Lock()
+    processes = processes or os.cpu_count() or 1
+    with multiprocessing.Pool(processes, initializer=_start_worker,
+                              initargs=(board, k, best_score, best_index,
+                                        lock)) as pool:
+        for _ in pool.imap_unordered(_score_root,
+                                     list(enumerate(cells))[1:]):
+            pass
+    best = cells[best_index.value]
+    return (best // len(board[0]), best % len(board[0]))
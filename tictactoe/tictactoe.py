@@ -2,21 +2,73 @@
 Tic Tac Toe Player
 """
 
+import array
+import bisect
 import math
 import copy
+import os
+import sys
+import time
 
 X = "X"
 O = "O"
 EMPTY = None
 
-
-def initial_state():
+# Cells of the board, numbered 0 to 8 row by row, in each line of three
+LINES = [
+    (0, 1, 2), (3, 4, 5), (6, 7, 8),
+    (0, 3, 6), (1, 4, 7), (2, 5, 8),
+    (0, 4, 8), (2, 4, 6)
+]
+
+# The 8 symmetries of the board (rotations and reflections), each as the
+# cell that moves to cell 0, 1, ..., 8
+SYMMETRIES = [
+    (0, 1, 2, 3, 4, 5, 6, 7, 8),
+    (6, 3, 0, 7, 4, 1, 8, 5, 2),
+    (8, 7, 6, 5, 4, 3, 2, 1, 0),
+    (2, 5, 8, 1, 4, 7, 0, 3, 6),
+    (2, 1, 0, 5, 4, 3, 8, 7, 6),
+    (6, 7, 8, 3, 4, 5, 0, 1, 2),
+    (0, 3, 6, 1, 4, 7, 2, 5, 8),
+    (8, 5, 2, 7, 4, 1, 6, 3, 0)
+]
+
+# Kinds of bound stored in the transposition table
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Maps canonical board keys to (bound, value), kept between calls
+TABLE = dict()
+
+# Opening book written by book.py: one 32-bit entry per canonical
+# position, read on first use (False if there is no book file)
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         "book.bin")
+BOOK = None
+
+# Bitboards: bit i of a 9-bit integer is cell i, and one integer holds
+# the cells of each player
+FULL = (1 << 9) - 1
+WINS = [sum(1 << i for i in line) for line in LINES]
+
+# The winning masks through each cell
+CELL_WINS = [[mask for mask in WINS if mask >> i & 1] for i in range(9)]
+
+# For each symmetry, the image of every set of cells
+TRANSFORMS = [
+    [sum(1 << i for i in range(9) if cells >> s[i] & 1)
+     for cells in range(1 << 9)]
+    for s in SYMMETRIES
+]
+
+
+def initial_state(rows=3, columns=3):
     """
     Returns starting state of the board.
     """
-    return [[EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY]]
+    return [[EMPTY] * columns for _ in range(rows)]
 
 
 def player(board):
@@ -63,36 +115,41 @@ def result(board, action):
     raise NotImplementedError
 
 
-def winner(board):
+def in_a_row(board):
     """
-    Returns the winner of the game, if there is one.
+    Returns how many marks in a row win on the board: 3 on the 3 x 3
+    board, the shorter side on boards up to 5 x 5, and 5 beyond.
     """
-    list_players = ["X", "O"]
-    for name_player in list_players:
-        list_check = []
-        # check_row
-        for row in board:
-            list_check.append(all([ceil == name_player for ceil in row]))
-        # check_col
-        for n_col in range(len(board[0])):
-            list_check.append(
-                all([row[n_col] == name_player for row in board]))
-        # check diagonal 3 x 3
-        diagonal_1 = [board[0][0], board[1][1], board[2][2]]
-        list_check.append(all([ceil == name_player for ceil in diagonal_1]))
+    return min(len(board), len(board[0]), 5)
 
-        diagonal_2 = [board[0][2], board[1][1], board[2][0]]
-        list_check.append(all([ceil == name_player for ceil in diagonal_2]))
 
-        if(any(list_check)):
-            return name_player
+def winner(board, k=None):
+    """
+    Returns the winner of the game, if there is one: the player with `k`
+    marks in a row, column or diagonal (by default, `in_a_row(board)`).
+    """
+    k = k or in_a_row(board)
+    rows, columns = len(board), len(board[0])
+    directions = [(0, 1), (1, 0), (1, 1), (1, -1)]
+    for i in range(rows):
+        for j in range(columns):
+            name_player = board[i][j]
+            if name_player == EMPTY:
+                continue
+            for di, dj in directions:
+                end_i, end_j = i + (k - 1) * di, j + (k - 1) * dj
+                if not (0 <= end_i < rows and 0 <= end_j < columns):
+                    continue
+                if all(board[i + step * di][j + step * dj] == name_player
+                       for step in range(1, k)):
+                    return name_player
     return None
-    raise NotImplementedError
 
 
-def terminal(board):
+def terminal(board, k=None):
     """
-    Returns True if game is over, False otherwise.
+    Returns True if game is over, False otherwise. The game is won with
+    `k` marks in a row (by default, `in_a_row(board)`).
     """
     cnt = 0
     for row in board:
@@ -100,7 +157,7 @@ def terminal(board):
             if ceil == EMPTY:
                 cnt += 1
 
-    return cnt == 0 or (winner(board) != None)
+    return cnt == 0 or (winner(board, k) != None)
     raise NotImplementedError
 
 
@@ -154,37 +211,283 @@ def optimal(board, alpha, beta):
         return min_utility
 
 
-def minimax(board):
+class Bitboard():
     """
-    Returns the optimal action for the current player on the board.
+    Tic Tac Toe board as two 9-bit integers, the cells held by X and by
+    O. Moves are played and undone in place with single bit operations.
     """
-    if terminal(board):
+
+    def __init__(self, x=0, o=0):
+        self.x = x
+        self.o = o
+
+    @classmethod
+    def from_board(cls, board):
+        """
+        Returns the bitboard of a list-of-lists board.
+        """
+        bitboard = cls()
+        for i, row in enumerate(board):
+            for j, cell in enumerate(row):
+                if cell == X:
+                    bitboard.x |= 1 << (3 * i + j)
+                elif cell == O:
+                    bitboard.o |= 1 << (3 * i + j)
+        return bitboard
+
+    def to_board(self):
+        """
+        Returns the list-of-lists board, as used by runner.py.
+        """
+        return [
+            [X if self.x >> (3 * i + j) & 1
+             else O if self.o >> (3 * i + j) & 1
+             else EMPTY
+             for j in range(3)]
+            for i in range(3)
+        ]
+
+    def player(self):
+        """
+        Returns player who has the next turn.
+        """
+        return X if bin(self.x).count("1") == bin(self.o).count("1") else O
+
+    def actions(self):
+        """
+        Returns the list of empty cells, as cell numbers.
+        """
+        empty = FULL & ~(self.x | self.o)
+        return [i for i in range(9) if empty >> i & 1]
+
+    def play(self, cell):
+        """
+        Marks `cell` for the player who has the next turn.
+        """
+        if self.player() == X:
+            self.x |= 1 << cell
+        else:
+            self.o |= 1 << cell
+
+    def undo(self, cell):
+        """
+        Clears `cell`, taking back the move made there.
+        """
+        self.x &= ~(1 << cell)
+        self.o &= ~(1 << cell)
+
+    def winner(self):
+        """
+        Returns the winner of the game, if there is one.
+        """
+        for mask in WINS:
+            if self.x & mask == mask:
+                return X
+            if self.o & mask == mask:
+                return O
         return None
 
-    name_player = player(board)
-    optimal_action = (0, 0)
+    def terminal(self):
+        """
+        Returns True if game is over, False otherwise.
+        """
+        return (self.x | self.o) == FULL or self.winner() is not None
 
-    if name_player == "X":
-        optimal_utility = -2
+    def key(self):
+        """
+        Returns a key identifying the board up to symmetry.
+        """
+        return board_key(self.x, self.o)
 
-        for action in actions(board):
-            n_board = result(board, action)
-            cur_ultility = optimal(n_board, -2, 2)
 
-            if cur_ultility > optimal_utility:
-                optimal_action = action
-                optimal_utility = cur_ultility
+def board_key(x, o):
+    """
+    Returns a key identifying the position up to symmetry: the smallest
+    of the 18-bit numbers spelled by the two bitboards under each of the
+    8 symmetries.
+    """
+    return min(t[x] << 9 | t[o] for t in TRANSFORMS)
+
+
+def canonical(x, o):
+    """
+    Returns (key, symmetry): the key of the position as in `board_key`,
+    and the index of a symmetry in SYMMETRIES that maps the bitboards
+    to it. Cell i of the canonical board is cell SYMMETRIES[s][i] of
+    the original.
+    """
+    return min((t[x] << 9 | t[o], s) for s, t in enumerate(TRANSFORMS))
+
+
+def load_book():
+    """
+    Returns the opening book as a sorted array of entries, reading it
+    from BOOK_FILE the first time, or False if there is no book.
+    """
+    global BOOK
+    if BOOK is None:
+        try:
+            with open(BOOK_FILE, "rb") as f:
+                BOOK = array.array("I")
+                BOOK.frombytes(f.read())
+        except FileNotFoundError:
+            BOOK = False
+        else:
+            if sys.byteorder == "big":
+                BOOK.byteswap()
+    return BOOK
+
+
+def book_entry(bitboard):
+    """
+    Returns (cell, value) for the position from the opening book: an
+    optimal cell to play and the value of the position for the player
+    to move. Returns None if the position is not in the book.
+
+    Each entry holds the canonical key of a position in its top 24
+    bits, the optimal cell on the canonical board in the next 6, and
+    the value plus one in the last 2.
+    """
+    book = load_book()
+    if not book:
+        return None
+    key, s = canonical(bitboard.x, bitboard.o)
+    i = bisect.bisect_left(book, key << 8)
+    if i == len(book) or book[i] >> 8 != key:
+        return None
+    entry = book[i]
+    return SYMMETRIES[s][entry >> 2 & 63], (entry & 3) - 1
+
+
+def search(mover, other, alpha, beta, counts=None, ply=0):
+    """
+    Returns the minimax value, for the player to move, of the position
+    where that player holds the cells in `mover` and the opponent those
+    in `other`, using alpha-beta pruning and the transposition table.
+    Values are 1 for a win, -1 for a loss and 0 for a draw.
+
+    A value found inside the (alpha, beta) window is exact; one at or
+    below alpha is only an upper bound and one at or above beta only a
+    lower bound. The table records which, so that a position reached
+    again, by another move order or as a symmetric copy, is cut off or
+    narrowed without being searched.
+
+    If `counts` is a dict with "nodes", "cutoffs", "hits" and "depth"
+    entries, the positions searched, beta cutoffs and table entries
+    used are added to them, and "depth" is raised to the deepest ply
+    searched (`ply` being that of this position).
+    """
+    if counts is not None:
+        counts["nodes"] += 1
+        counts["depth"] = max(counts["depth"], ply)
+    empty = FULL & ~(mover | other)
+    if not empty:
+        return 0
+
+    key = board_key(mover, other)
+    entry = TABLE.get(key)
+    if entry is not None:
+        if counts is not None:
+            counts["hits"] += 1
+        bound, value = entry
+        if bound == EXACT:
+            return value
+        if bound == LOWER:
+            alpha = max(alpha, value)
+        else:
+            beta = min(beta, value)
+        if alpha >= beta:
+            return value
+    window = (alpha, beta)
+
+    value = -2
+    for i in range(9):
+        if not empty >> i & 1:
+            continue
+        moved = mover | 1 << i
+
+        # Only lines through the new mark can have just been completed
+        for mask in CELL_WINS[i]:
+            if moved & mask == mask:
+                value = 1
+                break
+        else:
+            value = max(value, -search(other, moved, -beta, -alpha,
+                                       counts, ply + 1))
+        alpha = max(alpha, value)
+        if alpha >= beta:
+            if counts is not None:
+                counts["cutoffs"] += 1
+            break
+
+    if value <= window[0]:
+        TABLE[key] = (UPPER, value)
+    elif value >= window[1]:
+        TABLE[key] = (LOWER, value)
     else:
-        optimal_utility = 2
+        TABLE[key] = (EXACT, value)
+    return value
 
-        for action in actions(board):
-            n_board = result(board, action)
-            cur_ultility = optimal(n_board, -2, 2)
 
-            if cur_ultility < optimal_utility:
-                optimal_action = action
-                optimal_utility = cur_ultility
+def minimax(board, stats=None, k=None):
+    """
+    Returns the optimal action for the current player on the board,
+    where `k` marks in a row win (by default, `in_a_row(board)`).
 
-    return optimal_action
+    If `stats` is a dict, the work done is added to its "nodes",
+    "cutoffs", "hits" (transposition table and opening book entries
+    used) and "seconds" entries, and its "depth" entry is raised to the
+    deepest ply searched.
+    """
+    if terminal(board, k):
+        return None
 
-    raise NotImplementedError
+    start = time.perf_counter()
+    counts = {"nodes": 0, "cutoffs": 0, "hits": 0, "depth": 0}
+    action = choose(board, counts, k)
+    if stats is not None:
+        for name in ["nodes", "cutoffs", "hits"]:
+            stats[name] = stats.get(name, 0) + counts[name]
+        stats["depth"] = max(stats.get("depth", 0), counts["depth"])
+        stats["seconds"] = (stats.get("seconds", 0)
+                            + time.perf_counter() - start)
+    return action
+
+
+def choose(board, counts, k=None):
+    """
+    Returns the optimal action on a board that is not over, where `k`
+    marks in a row win, adding the work done to `counts` (see `search`).
+    """
+
+    # Other boards and lengths are searched for the time budget of the
+    # m,n,k engine, imported here as it builds on this module
+    if len(board) != 3 or len(board[0]) != 3 or k not in (None, 3):
+        import mnk
+        return mnk.best_move(board, k, budget=mnk.BUDGET, counts=counts)
+
+    bitboard = Bitboard.from_board(board)
+    entry = book_entry(bitboard)
+    if entry is not None:
+        counts["hits"] += 1
+        cell, _ = entry
+        return (cell // 3, cell % 3)
+
+    if player(board) == X:
+        mover, other = bitboard.x, bitboard.o
+    else:
+        mover, other = bitboard.o, bitboard.x
+
+    # Search each action with the window narrowed by the best so far
+    optimal_action = None
+    optimal_utility = -2
+    for cell in bitboard.actions():
+        moved = mover | 1 << cell
+        if any(moved & mask == mask for mask in CELL_WINS[cell]):
+            return (cell // 3, cell % 3)
+        cur_utility = -search(other, moved, -2, -optimal_utility, counts, 1)
+        if cur_utility > optimal_utility:
+            optimal_action = (cell // 3, cell % 3)
+            optimal_utility = cur_utility
+
+    return optimal_action